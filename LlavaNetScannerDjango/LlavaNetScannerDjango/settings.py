@@ -12,11 +12,18 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The scanner app uses the file walker, hasher and image preprocessor kept in the
+# repository root for the Streamlit scanner, so both apps share one copy
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -181,3 +188,7 @@ LOGGING = {
         },
     },
 }
+
+# Scan jobs run in a background thread of the web process by default.
+# Set SCAN_WORKER_IN_PROCESS=false and run `manage.py run_scan_worker` to use a separate worker.
+SCAN_WORKER_IN_PROCESS = os.getenv('SCAN_WORKER_IN_PROCESS', 'true').lower() != 'false'
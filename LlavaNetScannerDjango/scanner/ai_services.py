@@ -1,17 +1,93 @@
 import ollama
 import os
+import time
 import logging
+import threading
 from datetime import datetime
+from asgiref.sync import sync_to_async
+from . import description_cache
+from .utils import prepare_image, MAX_IMAGE_SIDE
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def generate_image_description(image_path, mode='detailed'):
+# Set the prompt based on the mode
+IMAGE_PROMPTS = {
+    'detailed': 'Describe this image in detail, focusing on technical aspects, materials, construction elements, and architectural features. Include any relevant measurements, colors, or specifications visible.',
+    
+    'concise': 'Provide a brief, focused description of this image in 2-3 sentences, highlighting the main subject and key features.',
+    
+    'creative': 'Describe this image in a narrative style, focusing on the story it tells and the atmosphere it creates. Consider the mood, lighting, and overall composition.',
+    
+    # Default to detailed if mode not recognized
+    'default': 'Describe this image in detail, focusing on technical aspects and key features.'
+}
+
+# Cache entries are tied to the size images are downsized to
+IMAGE_MODEL_KEY = f'llava@{MAX_IMAGE_SIDE}px'
+
+# Bytes sent and time spent per image file type, since the process started
+_image_stats_lock = threading.Lock()
+_image_stats = {}
+
+def record_image_stats(image_path, original_bytes, sent_bytes, prepare_seconds, describe_seconds):
+    """Add one describe call to the per file type totals"""
+    file_type = os.path.splitext(image_path)[1].lower()
+    logger.debug(f"Sent {sent_bytes} of {original_bytes} bytes for {image_path} "
+                 f"(prepare {prepare_seconds * 1000:.0f} ms, describe {describe_seconds:.2f} s)")
+    with _image_stats_lock:
+        totals = _image_stats.setdefault(file_type, {
+            'files': 0, 'original_bytes': 0, 'sent_bytes': 0,
+            'prepare_seconds': 0.0, 'describe_seconds': 0.0
+        })
+        totals['files'] += 1
+        totals['original_bytes'] += original_bytes
+        totals['sent_bytes'] += sent_bytes
+        totals['prepare_seconds'] += prepare_seconds
+        totals['describe_seconds'] += describe_seconds
+
+def get_image_stats():
+    """Return a copy of the per file type totals"""
+    with _image_stats_lock:
+        return {file_type: dict(totals) for file_type, totals in _image_stats.items()}
+
+def image_stats_since(start):
+    """
+    Summarise the describe calls made since `start` (an earlier get_image_stats())
+    as {file_type: {'files', 'bytes_saved', 'prepare_ms', 'describe_seconds'}}
+    with averages per file
+    """
+    summary = {}
+    for file_type, totals in get_image_stats().items():
+        before = start.get(file_type, {})
+        files = totals['files'] - before.get('files', 0)
+        if not files:
+            continue
+        saved = ((totals['original_bytes'] - before.get('original_bytes', 0)) -
+                 (totals['sent_bytes'] - before.get('sent_bytes', 0)))
+        summary[file_type] = {
+            'files': files,
+            'bytes_saved': saved,
+            'prepare_ms': round(1000 * (totals['prepare_seconds'] - before.get('prepare_seconds', 0)) / files),
+            'describe_seconds': round((totals['describe_seconds'] - before.get('describe_seconds', 0)) / files, 2)
+        }
+    return summary
+
+def shorten_for_mode(description, mode):
+    """For concise mode, ensure response isn't too long"""
+    if mode.lower() == 'concise' and len(description.split()) > 50:
+        # Take first few sentences
+        sentences = description.split('.')[:3]
+        description = '. '.join(sentences) + '.'
+    return description
+
+def generate_image_description(image_path, mode='detailed', file_size=None):
     """
     Generate a description of an image using different modes:
     - detailed: Technical and comprehensive description
     - concise: Brief, focused description
     - creative: More artistic/narrative description
+    `file_size` is the size from the directory walk, if the caller has it.
     """
     try:
         logger.debug(f"Generating description for image: {image_path} with mode: {mode}")
@@ -21,43 +97,99 @@ def generate_image_description(image_path, mode='detailed'):
             logger.error(f"Image file does not exist: {image_path}")
             return f"Error: Image file not found at {image_path}"
         
-        # Set the prompt based on the mode
-        prompts = {
-            'detailed': 'Describe this image in detail, focusing on technical aspects, materials, construction elements, and architectural features. Include any relevant measurements, colors, or specifications visible.',
-            
-            'concise': 'Provide a brief, focused description of this image in 2-3 sentences, highlighting the main subject and key features.',
-            
-            'creative': 'Describe this image in a narrative style, focusing on the story it tells and the atmosphere it creates. Consider the mood, lighting, and overall composition.',
-            
-            # Default to detailed if mode not recognized
-            'default': 'Describe this image in detail, focusing on technical aspects and key features.'
-        }
-        
         # Get appropriate prompt or fall back to default
-        content = prompts.get(mode.lower(), prompts['default'])
+        content = IMAGE_PROMPTS.get(mode.lower(), IMAGE_PROMPTS['default'])
         logger.debug(f"Using prompt: {content}")
         
+        # Reuse the description of an identical file if one was already generated
+        cache_key = description_cache.make_key(image_path, IMAGE_MODEL_KEY, mode.lower(), content)
+        cached = description_cache.get_description(cache_key)
+        if cached is not None:
+            logger.debug(f"Description cache hit for: {image_path}")
+            return cached
+        
+        # Downsize and re-encode the image in memory before sending it
+        if file_size is None:
+            file_size = os.path.getsize(image_path)
+        prepare_start = time.perf_counter()
+        image, sent_bytes = prepare_image(image_path, original_size=file_size)
+        prepare_seconds = time.perf_counter() - prepare_start
+        
         # Format the message for Ollama
         messages = [{
             'role': 'user',
             'content': content,
-            'images': [image_path]
+            'images': [image]
         }]
         
         # Generate the response
         logger.debug("Calling Ollama API with llava model")
+        describe_start = time.perf_counter()
         response = ollama.chat(model='llava', messages=messages)
+        record_image_stats(image_path, file_size, sent_bytes, prepare_seconds, time.perf_counter() - describe_start)
         logger.debug(f"Received response from Ollama: {response}")
         
         # Format and clean up the response
         description = response['message']['content'].strip()
         
-        # For concise mode, ensure response isn't too long
-        if mode.lower() == 'concise' and len(description.split()) > 50:
-            # Take first few sentences
-            sentences = description.split('.')[:3]
-            description = '. '.join(sentences) + '.'
-            
+        description = shorten_for_mode(description, mode)
+        
+        description_cache.put_description(cache_key, description)
+        logger.debug(f"Returning description with length: {len(description)}")
+        return description
+        
+    except Exception as e:
+        logger.exception(f"Error generating image description: {str(e)}")
+        return f"Error generating description: {str(e)}"
+
+async def generate_image_description_async(image_path, mode='detailed', client=None, file_size=None):
+    """
+    Async version of generate_image_description using ollama.AsyncClient.
+    Hashing runs in a worker thread and cache lookups go through the ORM thread.
+    """
+    try:
+        logger.debug(f"Generating description for image: {image_path} with mode: {mode}")
+        
+        # Check if image exists
+        if not os.path.exists(image_path):
+            logger.error(f"Image file does not exist: {image_path}")
+            return f"Error: Image file not found at {image_path}"
+        
+        content = IMAGE_PROMPTS.get(mode.lower(), IMAGE_PROMPTS['default'])
+        
+        # Reuse the description of an identical file if one was already generated
+        cache_key = await sync_to_async(description_cache.make_key, thread_sensitive=False)(
+            image_path, IMAGE_MODEL_KEY, mode.lower(), content
+        )
+        cached = await sync_to_async(description_cache.get_description)(cache_key)
+        if cached is not None:
+            logger.debug(f"Description cache hit for: {image_path}")
+            return cached
+        
+        # Decoding and resizing is CPU work, so keep it off the event loop
+        if file_size is None:
+            file_size = os.path.getsize(image_path)
+        prepare_start = time.perf_counter()
+        image, sent_bytes = await sync_to_async(prepare_image, thread_sensitive=False)(
+            image_path, original_size=file_size
+        )
+        prepare_seconds = time.perf_counter() - prepare_start
+        
+        messages = [{
+            'role': 'user',
+            'content': content,
+            'images': [image]
+        }]
+        
+        logger.debug("Calling Ollama API with llava model (async)")
+        client = client or ollama.AsyncClient()
+        describe_start = time.perf_counter()
+        response = await client.chat(model='llava', messages=messages)
+        record_image_stats(image_path, file_size, sent_bytes, prepare_seconds, time.perf_counter() - describe_start)
+        
+        description = shorten_for_mode(response['message']['content'].strip(), mode)
+        
+        await sync_to_async(description_cache.put_description)(cache_key, description)
         logger.debug(f"Returning description with length: {len(description)}")
         return description
         
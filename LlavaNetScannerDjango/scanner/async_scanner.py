@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import logging
+import os
+import ollama
+from asgiref.sync import async_to_sync, sync_to_async
+from .utils import is_image_file, hash_file, walk_files, CUTOFF_DATE
+from .ai_services import generate_image_description_async
+from .scanner_service import (
+    process_file, start_scan_run, new_scan_stats, load_known_files,
+    should_process, save_result, finish_scan_run, scan_counters
+)
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Number of describe calls kept in flight against the Ollama server
+DESCRIBE_CONCURRENCY = int(os.getenv('DESCRIBE_WORKERS', '4'))
+
+# Files pulled from the directory walk per executor call
+WALK_CHUNK_SIZE = 64
+
+async def describe_entry(entry, directory_path, options, semaphore, client):
+    """Describe one walked file, holding a semaphore slot for the duration"""
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        if is_image_file(entry.name):
+            description = await generate_image_description_async(entry.path, options['mode'], client,
+                                                                 file_size=entry.size)
+            result = process_file(entry.path, directory_path, options['mode'],
+                                  entry=entry, description=description)
+        else:
+            # Design files and PDFs are described locally, off the event loop
+            result = await loop.run_in_executor(
+                None, process_file, entry.path, directory_path, options['mode'], entry
+            )
+
+        if options['use_hash']:
+            result['content_hash'] = await loop.run_in_executor(None, hash_file, entry.path)
+        return result
+
+async def scan_directory_async(directory_path, description_mode='detailed', cutoff_date=None,
+                               incremental=False, use_hash=False, resume=False,
+                               concurrency=DESCRIBE_CONCURRENCY, on_progress=None):
+    """
+    Asyncio version of scanner_service.scan_directory with the same options
+    and the same return value.
+
+    A producer walks the tree in a worker thread and starts a describe task per
+    file; at most `concurrency` Ollama requests run at once, and the bounded
+    queue between producer and writer stops the walk from running far ahead.
+    The writer saves results in the order the files were found, so the
+    ScanRun cursor stays valid for resuming. All ORM work goes through
+    sync_to_async.
+
+    `on_progress(stats, current_path)` is called from the ORM thread as files
+    are checked and saved; if it returns True the scan stops, queued describe
+    tasks are cancelled and the ScanRun is left open so it can be resumed.
+    """
+    logger.info(f"Starting async directory scan: {directory_path} ({concurrency} concurrent requests)")
+
+    if cutoff_date is None:
+        cutoff_date = CUTOFF_DATE
+
+    loop = asyncio.get_running_loop()
+    concurrency = max(1, int(concurrency))
+
+    run, options, start_after = await sync_to_async(start_scan_run)(
+        directory_path, description_mode, cutoff_date, incremental, use_hash, resume
+    )
+
+    stats = new_scan_stats()
+    counters_start = scan_counters()
+    processed_files = []
+    known_files = await sync_to_async(load_known_files)(options['incremental'])
+
+    stop = False
+    
+    def report(current_path):
+        """Pass progress to the caller and note whether it asked to stop"""
+        nonlocal stop
+        if on_progress is not None and on_progress(stats, current_path):
+            stop = True
+    
+    def check_entry(entry):
+        """Run the skip checks for a walked file and report progress"""
+        process = should_process(entry, options, known_files, stats)
+        report(entry.path)
+        return process
+    
+    def save_and_report(result):
+        """Save a finished result and report progress"""
+        save_result(result, directory_path, run, stats, processed_files)
+        report(result['file_path'])
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=2 * concurrency)
+    client = ollama.AsyncClient()
+
+    async def produce():
+        """Walk the tree and queue a describe task for every file that needs one"""
+        entries = walk_files(directory_path, start_after=start_after)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    None, lambda: list(itertools.islice(entries, WALK_CHUNK_SIZE))
+                )
+                if not chunk:
+                    break
+
+                for entry in chunk:
+                    if stop:
+                        return
+                    try:
+                        if not await sync_to_async(check_entry)(entry):
+                            continue
+                    except Exception as e:
+                        logger.exception(f"Error processing file {entry.name}: {str(e)}")
+                        stats['errors'].append(f"Error processing {entry.name}: {str(e)}")
+                        continue
+
+                    task = asyncio.create_task(
+                        describe_entry(entry, directory_path, options, semaphore, client)
+                    )
+                    # Waits here while the writer is behind
+                    await queue.put((entry, task))
+        finally:
+            await queue.put(None)
+
+    async def consume():
+        """Save finished results in the order their files were queued"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+
+            entry, task = item
+            if stop:
+                task.cancel()
+                continue
+            try:
+                result = await task
+                await sync_to_async(save_and_report)(result)
+            except Exception as e:
+                logger.exception(f"Error processing file {entry.name}: {str(e)}")
+                stats['errors'].append(f"Error processing {entry.name}: {str(e)}")
+
+    try:
+        await asyncio.gather(produce(), consume())
+        if stop:
+            logger.info(f"Scan stopped on request. Stats: {stats}")
+        else:
+            await sync_to_async(finish_scan_run)(run, stats, counters_start)
+    except Exception as e:
+        logger.exception(f"Error scanning directory {directory_path}: {str(e)}")
+        stats['errors'].append(f"Error scanning directory: {str(e)}")
+
+    return {
+        'stats': stats,
+        'processed_files': processed_files,
+        'cancelled': stop
+    }
+
+def scan_directory_concurrent(*args, **kwargs):
+    """Run scan_directory_async from synchronous code such as a view"""
+    return async_to_sync(scan_directory_async)(*args, **kwargs)
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import os
+import threading
+from django.db.models import Sum
+from django.utils import timezone
+from .models import DescriptionCacheEntry
+from .utils import hash_file
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Upper bound on the stored description text before least recently used entries are evicted
+CACHE_MAX_BYTES = int(os.getenv('DESCRIPTION_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+# Running total of stored bytes, loaded on the first put; only recomputed when evicting
+_total_lock = threading.Lock()
+_total_bytes = None
+
+def make_key(file_path, model, mode, prompt):
+    """Build the cache key from the file's content digest and the request settings"""
+    key = hashlib.sha256()
+    for part in (hash_file(file_path), model, mode, prompt):
+        key.update(part.encode('utf-8'))
+        key.update(b'\0')
+    return key.hexdigest()
+
+def get_description(cache_key):
+    """Return the cached description for a key, or None"""
+    entry = DescriptionCacheEntry.objects.filter(cache_key=cache_key).only('description').first()
+    with _stats_lock:
+        _stats['hits' if entry else 'misses'] += 1
+    if entry is None:
+        return None
+
+    DescriptionCacheEntry.objects.filter(pk=entry.pk).update(last_used=timezone.now())
+    return entry.description
+
+def put_description(cache_key, description):
+    """Store a description and evict old entries if the cache is over its size limit"""
+    global _total_bytes
+    size = len(description.encode('utf-8'))
+    DescriptionCacheEntry.objects.update_or_create(
+        cache_key=cache_key,
+        defaults={
+            'description': description,
+            'size': size,
+            'last_used': timezone.now()
+        }
+    )
+
+    with _total_lock:
+        if _total_bytes is None:
+            _total_bytes = stored_bytes()
+        else:
+            _total_bytes += size
+        if _total_bytes <= CACHE_MAX_BYTES:
+            return
+
+        # Replaced entries and other processes make the running total drift, so count again
+        total = stored_bytes()
+        # Drop least recently used entries until the total fits again
+        evict = []
+        for pk, entry_size in DescriptionCacheEntry.objects.order_by('last_used').values_list('pk', 'size').iterator():
+            if total <= CACHE_MAX_BYTES:
+                break
+            evict.append(pk)
+            total -= entry_size
+        DescriptionCacheEntry.objects.filter(pk__in=evict).delete()
+        _total_bytes = total
+    logger.debug(f"Evicted {len(evict)} description cache entries")
+
+def stored_bytes():
+    """Total size of the stored descriptions"""
+    return DescriptionCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+
+def get_stats():
+    """Return the hit and miss counters since the process started"""
+    with _stats_lock:
+        return dict(_stats)
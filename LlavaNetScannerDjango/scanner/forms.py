@@ -28,6 +28,33 @@ class ScanDirectoryForm(forms.Form):
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
     
+    incremental = forms.BooleanField(
+        label="Only describe new or changed files",
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
+    use_hash = forms.BooleanField(
+        label="Verify changes with a content hash",
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
+    concurrency = forms.IntegerField(
+        label="Concurrent AI requests",
+        initial=4,
+        min_value=1,
+        max_value=32,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    
+    resume = forms.BooleanField(
+        label="Resume interrupted scan",
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
 class SearchForm(forms.Form):
     """Form for searching scan results"""
     search_term = forms.CharField(
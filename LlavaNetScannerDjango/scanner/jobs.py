@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from django.utils.timezone import make_aware
+from .models import ScanJob
+from .async_scanner import scan_directory_concurrent
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# How often a running job writes its progress and checks for cancellation
+PROGRESS_INTERVAL = 1.0
+
+# How long the worker sleeps when there are no queued jobs
+POLL_INTERVAL = 2.0
+
+# A running job that has not reported for this long lost its worker
+STALE_AFTER = timedelta(minutes=10)
+
+_worker_lock = threading.Lock()
+_worker_thread = None
+
+def count_files(directory_path):
+    """Count files below a directory without stat calls, for the progress total"""
+    total = 0
+    stack = [directory_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += 1
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+def submit_scan_job(directory_path, options):
+    """Queue a scan and make sure a worker will pick it up"""
+    job = ScanJob.objects.create(directory_path=directory_path, options=options)
+    logger.info(f"Queued scan job {job.pk} for {directory_path}")
+    if getattr(settings, 'SCAN_WORKER_IN_PROCESS', True):
+        ensure_worker()
+    return job
+
+def ensure_worker():
+    """Start the in-process worker thread if it is not already running"""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(
+                target=run_worker, kwargs={'exit_when_idle': True},
+                name='scan-worker', daemon=True
+            )
+            _worker_thread.start()
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running, or return None"""
+    for job in ScanJob.objects.filter(status=ScanJob.STATUS_QUEUED).order_by('created_at'):
+        claimed = ScanJob.objects.filter(pk=job.pk, status=ScanJob.STATUS_QUEUED).update(
+            status=ScanJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        # Another worker may have taken it first
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+def fail_stale_jobs():
+    """Mark running jobs whose worker stopped reporting as failed"""
+    stale = ScanJob.objects.filter(
+        status=ScanJob.STATUS_RUNNING,
+        updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(
+        status=ScanJob.STATUS_FAILED,
+        error='The worker running this scan stopped. Submit it again with resume to continue.',
+        finished_at=timezone.now()
+    )
+    if stale:
+        logger.warning(f"Marked {stale} stale scan job(s) as failed")
+
+def progress_reporter(job):
+    """
+    Build the on_progress callback for a job. Progress is written to the job
+    at most once per PROGRESS_INTERVAL, and the same query reads back whether
+    a cancel was requested.
+    """
+    started = time.monotonic()
+    last_report = 0.0
+    cancel_requested = False
+
+    def on_progress(stats, current_path):
+        nonlocal last_report, cancel_requested
+        now = time.monotonic()
+        if now - last_report < PROGRESS_INTERVAL:
+            return cancel_requested
+        last_report = now
+
+        elapsed = now - started
+        rate = stats['files_found'] / elapsed if elapsed > 0 else 0
+        eta_seconds = None
+        if job.total_files and rate > 0:
+            eta_seconds = max(job.total_files - stats['files_found'], 0) / rate
+
+        ScanJob.objects.filter(pk=job.pk).update(
+            files_found=stats['files_found'],
+            files_processed=stats['files_processed'],
+            files_skipped=stats['files_skipped'],
+            current_path=current_path[:1024],
+            rate=rate,
+            eta_seconds=eta_seconds,
+            updated_at=timezone.now()
+        )
+        cancel_requested = ScanJob.objects.filter(pk=job.pk, cancel_requested=True).exists()
+        return cancel_requested
+
+    return on_progress
+
+def run_job(job):
+    """Run one claimed job to completion, failure or cancellation"""
+    options = job.options
+    logger.info(f"Running scan job {job.pk}: {job.directory_path}")
+    try:
+        job.total_files = count_files(job.directory_path)
+        job.save(update_fields=['total_files', 'updated_at'])
+
+        cutoff = options.get('cutoff_date')
+        cutoff_datetime = make_aware(datetime.fromisoformat(cutoff)) if cutoff else None
+
+        result = scan_directory_concurrent(
+            job.directory_path,
+            options.get('description_mode', 'detailed'),
+            cutoff_datetime,
+            incremental=options.get('incremental', False),
+            use_hash=options.get('use_hash', False),
+            resume=options.get('resume', False),
+            concurrency=options.get('concurrency', 4),
+            on_progress=progress_reporter(job)
+        )
+
+        stats = result['stats']
+        job.status = ScanJob.STATUS_CANCELLED if result['cancelled'] else ScanJob.STATUS_COMPLETED
+        job.files_found = stats['files_found']
+        job.files_processed = stats['files_processed']
+        job.files_skipped = stats['files_skipped']
+        job.stats = stats
+        job.eta_seconds = None
+    except Exception as e:
+        logger.exception(f"Scan job {job.pk} failed: {str(e)}")
+        job.status = ScanJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'files_found', 'files_processed', 'files_skipped', 'stats',
+        'eta_seconds', 'error', 'finished_at', 'updated_at'
+    ])
+    logger.info(f"Scan job {job.pk} finished with status {job.status}")
+
+def run_worker(exit_when_idle=False):
+    """
+    Run queued scan jobs one at a time. The in-process thread exits once the
+    queue is empty; the run_scan_worker command keeps polling.
+    """
+    try:
+        fail_stale_jobs()
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if exit_when_idle and _retire_worker():
+                    break
+                if not exit_when_idle:
+                    time.sleep(POLL_INTERVAL)
+                continue
+            run_job(job)
+    finally:
+        connections.close_all()
+
+def _retire_worker():
+    """
+    Let the in-process thread exit if nothing was queued meanwhile. Holding the
+    lock means submit_scan_job either sees the thread gone or its job is seen here.
+    """
+    global _worker_thread
+    with _worker_lock:
+        if ScanJob.objects.filter(status=ScanJob.STATUS_QUEUED).exists():
+            return False
+        _worker_thread = None
+        return True
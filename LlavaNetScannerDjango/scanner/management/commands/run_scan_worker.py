@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from scanner.jobs import run_worker
+
+class Command(BaseCommand):
+    help = 'Run queued scan jobs in a separate worker process'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Waiting for scan jobs. Press Ctrl+C to stop.')
+        try:
+            run_worker()
+        except KeyboardInterrupt:
+            self.stdout.write('Scan worker stopped.')
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0002_scanresult_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DescriptionCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('description', models.TextField()),
+                ('size', models.IntegerField(default=0)),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0004_scanrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('directory_path', models.CharField(max_length=1024)),
+                ('options', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('total_files', models.IntegerField(blank=True, null=True)),
+                ('files_found', models.IntegerField(default=0)),
+                ('files_processed', models.IntegerField(default=0)),
+                ('files_skipped', models.IntegerField(default=0)),
+                ('current_path', models.CharField(blank=True, default='', max_length=1024)),
+                ('rate', models.FloatField(default=0)),
+                ('eta_seconds', models.FloatField(blank=True, null=True)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status'], name='scanner_sca_status_d3533d_idx')],
+            },
+        ),
+    ]
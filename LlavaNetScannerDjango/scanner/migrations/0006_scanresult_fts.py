@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Full-text index over filenames and descriptions, kept in sync with
+# scanner_scanresult by triggers. Only created on SQLite, which has FTS5;
+# scanner.search falls back to icontains on other databases.
+CREATE_SQL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS scanner_scanresult_fts USING fts5(
+        filename, description,
+        content='scanner_scanresult', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS scanner_scanresult_fts_insert AFTER INSERT ON scanner_scanresult BEGIN
+        INSERT INTO scanner_scanresult_fts (rowid, filename, description)
+        VALUES (new.id, new.filename, new.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS scanner_scanresult_fts_delete AFTER DELETE ON scanner_scanresult BEGIN
+        INSERT INTO scanner_scanresult_fts (scanner_scanresult_fts, rowid, filename, description)
+        VALUES ('delete', old.id, old.filename, old.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS scanner_scanresult_fts_update AFTER UPDATE OF filename, description ON scanner_scanresult BEGIN
+        INSERT INTO scanner_scanresult_fts (scanner_scanresult_fts, rowid, filename, description)
+        VALUES ('delete', old.id, old.filename, old.description);
+        INSERT INTO scanner_scanresult_fts (rowid, filename, description)
+        VALUES (new.id, new.filename, new.description);
+    END
+    ''',
+    # Index the rows that already exist
+    "INSERT INTO scanner_scanresult_fts (scanner_scanresult_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS scanner_scanresult_fts_insert",
+    "DROP TRIGGER IF EXISTS scanner_scanresult_fts_delete",
+    "DROP TRIGGER IF EXISTS scanner_scanresult_fts_update",
+    "DROP TABLE IF EXISTS scanner_scanresult_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0005_scanjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
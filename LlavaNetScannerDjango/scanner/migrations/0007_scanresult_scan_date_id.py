@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0006_scanresult_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scanresult',
+            index=models.Index(fields=['-scan_date', '-id'], name='scanresult_scan_date_id'),
+        ),
+    ]
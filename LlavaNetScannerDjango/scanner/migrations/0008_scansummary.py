@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+# Triggers that keep scanner_scansummary in step with scanner_scanresult.
+# Only created on SQLite; scanner.summary aggregates the results directly
+# on other databases.
+ADD_GROUP = '''
+    INSERT INTO scanner_scansummary (file_type, contractor, project, file_count, total_size)
+    VALUES (new.file_type, new.contractor, new.project, 1, new.file_size)
+    ON CONFLICT (file_type, contractor, project) DO UPDATE SET
+        file_count = file_count + 1,
+        total_size = total_size + excluded.total_size;
+'''
+
+REMOVE_GROUP = '''
+    UPDATE scanner_scansummary SET
+        file_count = file_count - 1,
+        total_size = total_size - old.file_size
+    WHERE file_type = old.file_type AND contractor = old.contractor AND project = old.project;
+    DELETE FROM scanner_scansummary WHERE file_count <= 0;
+'''
+
+CREATE_SQL = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS scanner_scansummary_insert AFTER INSERT ON scanner_scanresult BEGIN
+        {ADD_GROUP}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS scanner_scansummary_delete AFTER DELETE ON scanner_scanresult BEGIN
+        {REMOVE_GROUP}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS scanner_scansummary_update
+    AFTER UPDATE OF file_type, contractor, project, file_size ON scanner_scanresult BEGIN
+        {REMOVE_GROUP}
+        {ADD_GROUP}
+    END
+    ''',
+    # Summarise the rows that already exist
+    "DELETE FROM scanner_scansummary",
+    '''
+    INSERT INTO scanner_scansummary (file_type, contractor, project, file_count, total_size)
+    SELECT file_type, contractor, project, COUNT(*), SUM(file_size)
+    FROM scanner_scanresult GROUP BY file_type, contractor, project
+    ''',
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS scanner_scansummary_insert",
+    "DROP TRIGGER IF EXISTS scanner_scansummary_delete",
+    "DROP TRIGGER IF EXISTS scanner_scansummary_update",
+]
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scanner', '0007_scanresult_scan_date_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_type', models.CharField(max_length=20)),
+                ('contractor', models.CharField(max_length=255)),
+                ('project', models.CharField(max_length=255)),
+                ('file_count', models.IntegerField(default=0)),
+                ('total_size', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('file_type', 'contractor', 'project'), name='scansummary_group')],
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
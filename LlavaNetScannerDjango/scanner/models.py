@@ -13,6 +13,7 @@ class ScanResult(models.Model):
     contractor = models.CharField(max_length=255, default="Unknown")
     project = models.CharField(max_length=255, default="Unknown")
     description = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
     
     # Timestamps
     scan_date = models.DateTimeField(auto_now_add=True)
@@ -27,4 +28,134 @@ class ScanResult(models.Model):
             models.Index(fields=['contractor']),
             models.Index(fields=['project']),
             models.Index(fields=['file_type']),
+            # Keyset pagination of the results list
+            models.Index(fields=['-scan_date', '-id'], name='scanresult_scan_date_id'),
+        ]
+
+
+
+class ScanSummary(models.Model):
+    """
+    File count and total size per file type, contractor and project. Kept in
+    step with ScanResult by database triggers (migration 0008, SQLite only),
+    so dashboards read one row per group instead of every result.
+    """
+    file_type = models.CharField(max_length=20)
+    contractor = models.CharField(max_length=255)
+    project = models.CharField(max_length=255)
+    file_count = models.IntegerField(default=0)
+    total_size = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.file_type} {self.contractor}/{self.project}: {self.file_count}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['file_type', 'contractor', 'project'], name='scansummary_group'),
+        ]
+
+class DescriptionCacheEntry(models.Model):
+    """Generated description keyed by file content, model, mode and prompt"""
+    cache_key = models.CharField(max_length=64, unique=True)
+    description = models.TextField()
+    size = models.IntegerField(default=0)
+    last_used = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return self.cache_key
+
+
+class ScanRun(models.Model):
+    """Journal entry for a scan so an interrupted scan can be resumed"""
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+    
+    root = models.CharField(max_length=1024)
+    options = models.JSONField(default=dict)
+    # Path (relative to root) of the last file written, in walk order
+    cursor = models.CharField(max_length=1024, blank=True, default="")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.root} ({self.status})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['root', 'status']),
+        ]
+
+
+class ScanJob(models.Model):
+    """Scan submitted from the web UI and run by a background worker"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+    
+    directory_path = models.CharField(max_length=1024)
+    options = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    cancel_requested = models.BooleanField(default=False)
+    
+    # Progress
+    total_files = models.IntegerField(null=True, blank=True)
+    files_found = models.IntegerField(default=0)
+    files_processed = models.IntegerField(default=0)
+    files_skipped = models.IntegerField(default=0)
+    current_path = models.CharField(max_length=1024, blank=True, default="")
+    rate = models.FloatField(default=0)  # files handled per second
+    eta_seconds = models.FloatField(null=True, blank=True)
+    
+    # Outcome
+    stats = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Scan of {self.directory_path} ({self.status})"
+    
+    def to_progress(self):
+        """Progress snapshot returned by the job status endpoint"""
+        return {
+            'id': self.pk,
+            'directory_path': self.directory_path,
+            'status': self.status,
+            'cancel_requested': self.cancel_requested,
+            'total_files': self.total_files,
+            'files_found': self.files_found,
+            'files_processed': self.files_processed,
+            'files_skipped': self.files_skipped,
+            'current_path': self.current_path,
+            'rate': round(self.rate, 2),
+            'eta_seconds': round(self.eta_seconds) if self.eta_seconds is not None else None,
+            'stats': self.stats,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
         ]
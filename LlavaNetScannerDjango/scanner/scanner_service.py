@@ -1,16 +1,22 @@
 import os
 import logging
 from datetime import datetime
+from django.db import transaction
 from django.utils.timezone import make_aware
-from .utils import is_valid_file, is_image_file, is_design_file, is_pdf_file, CUTOFF_DATE
-from .models import ScanResult
-from .ai_services import generate_image_description, describe_design, describe_pdf
+from .utils import has_valid_extension, is_image_file, is_design_file, is_pdf_file, hash_file, walk_files, CUTOFF_DATE
+from .models import ScanResult, ScanRun
+from .ai_services import generate_image_description, describe_design, describe_pdf, get_image_stats, image_stats_since
+from . import description_cache
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def process_file(file_path, directory, description_mode='detailed'):
-    """Process a file and return its metadata and description"""
+def process_file(file_path, directory, description_mode='detailed', entry=None, description=None):
+    """
+    Process a file and return its metadata and description
+    Pass the FileEntry from walk_files as `entry` to reuse its stat data,
+    and an already generated `description` to skip the describe step
+    """
     try:
         logger.debug(f"Processing file: {file_path}")
         
@@ -26,21 +32,26 @@ def process_file(file_path, directory, description_mode='detailed'):
         # Get file type
         file_type = os.path.splitext(filename)[1].lower()
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # Get file size and last modified time from one stat
+        if entry is None:
+            file_stats = os.stat(file_path)
+            file_size, mtime = file_stats.st_size, file_stats.st_mtime
+        else:
+            file_size, mtime = entry.size, entry.mtime
         
-        # Get last modified time - make timezone aware
-        last_modified = make_aware(datetime.fromtimestamp(os.path.getmtime(file_path)))
+        # Make last modified time timezone aware
+        last_modified = make_aware(datetime.fromtimestamp(mtime))
         
         # Log file details
         logger.debug(f"File details - Filename: {filename}, Type: {file_type}, Size: {file_size}")
         logger.debug(f"File organization - Contractor: {contractor}, Project: {project}")
         
         # Get file description based on type
-        description = ''
-        if is_image_file(filename):
+        if description is not None:
+            logger.debug("Using description generated by the caller")
+        elif is_image_file(filename):
             logger.debug(f"Identified as image file, generating description")
-            description = generate_image_description(file_path, mode=description_mode)
+            description = generate_image_description(file_path, mode=description_mode, file_size=file_size)
         elif is_design_file(filename):
             logger.debug(f"Identified as design file, generating description")
             description = describe_design(file_path)
@@ -80,86 +91,235 @@ def process_file(file_path, directory, description_mode='detailed'):
             'last_modified': make_aware(datetime.now())  # Make timezone aware
         }
 
-def scan_directory(directory_path, description_mode='detailed', cutoff_date=None):
+def is_unchanged(known, file_size, mtime):
+    """Check a stored result's size and modification time against a fresh stat"""
+    stored_size, stored_modified, _ = known
+    if stored_size != file_size or stored_modified is None:
+        return False
+    return abs(stored_modified.timestamp() - mtime) < 0.001
+
+def start_scan_run(directory_path, description_mode, cutoff_date, incremental, use_hash, resume):
+    """
+    Journal a scan so it can be continued if the process stops part way.
+    With `resume`, the last unfinished run for the directory is picked up again.
+    Returns the run, the options to scan with and the path to start after.
+    """
+    root = os.path.abspath(directory_path)
+    run = None
+    if resume:
+        run = (ScanRun.objects.filter(root=root, status=ScanRun.STATUS_RUNNING)
+               .order_by('-id').first())
+    if run:
+        options = {
+            'mode': run.options['mode'],
+            'cutoff': datetime.fromisoformat(run.options['cutoff']) if run.options['cutoff'] else None,
+            'incremental': run.options['incremental'],
+            'use_hash': run.options['use_hash']
+        }
+        start_after = run.cursor or None
+        logger.info(f"Resuming scan run {run.pk} after: {start_after}")
+    else:
+        options = {
+            'mode': description_mode,
+            'cutoff': cutoff_date,
+            'incremental': incremental,
+            'use_hash': use_hash
+        }
+        start_after = None
+        run = ScanRun.objects.create(root=root, options={
+            **options,
+            'cutoff': cutoff_date.isoformat() if cutoff_date else None
+        })
+    return run, options, start_after
+
+def new_scan_stats():
+    """Counters returned by every scan engine"""
+    return {
+        'files_found': 0,
+        'files_processed': 0,
+        'files_skipped': 0,
+        'files_new': 0,
+        'files_changed': 0,
+        'files_unchanged': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'images': {},
+        'errors': []
+    }
+
+def load_known_files(incremental):
+    """Load stored stats for every known file in one query"""
+    if not incremental:
+        return {}
+    known_files = {
+        row[0]: row[1:] for row in ScanResult.objects.values_list(
+            'file_path', 'file_size', 'last_modified', 'content_hash'
+        ).iterator()
+    }
+    logger.info(f"Loaded {len(known_files)} known files for change detection")
+    return known_files
+
+def should_process(entry, options, known_files, stats):
+    """
+    Apply the type, cutoff and change checks to a walked file and update the
+    counters. Returns True if the file needs to be described.
+    """
+    file_path = entry.path
+    stats['files_found'] += 1
+    
+    # Check if file is valid
+    if not has_valid_extension(entry.name):
+        logger.debug(f"Skipping invalid file: {file_path}")
+        stats['files_skipped'] += 1
+        return False
+    
+    # Check if file modified after cutoff date - make timezone aware
+    file_modified = make_aware(datetime.fromtimestamp(entry.mtime))
+    if options['cutoff'] and file_modified < options['cutoff']:
+        logger.debug(f"Skipping file older than cutoff: {file_path}")
+        stats['files_skipped'] += 1
+        return False
+    
+    # Skip files that have not changed since they were described
+    known = known_files.get(file_path)
+    if known:
+        unchanged = is_unchanged(known, entry.size, entry.mtime)
+        
+        # A touched but identical file only needs its stats refreshed
+        if (not unchanged and options['use_hash'] and known[2] and
+                known[0] == entry.size and
+                hash_file(file_path) == known[2]):
+            ScanResult.objects.filter(file_path=file_path).update(
+                last_modified=file_modified
+            )
+            unchanged = True
+        
+        if unchanged:
+            logger.debug(f"Skipping unchanged file: {file_path}")
+            stats['files_unchanged'] += 1
+            stats['files_skipped'] += 1
+            return False
+        
+        stats['files_changed'] += 1
+    elif options['incremental']:
+        stats['files_new'] += 1
+    return True
+
+def save_result(result, directory_path, run, stats, processed_files):
+    """Create or update the database entry for a result and move the journal cursor"""
+    file_path = result['file_path']
+    try:
+        # Save the result and move the journal cursor together
+        with transaction.atomic():
+            scan_result, created = ScanResult.objects.update_or_create(
+                file_path=file_path,
+                defaults={
+                    'filename': result['filename'],
+                    'contractor': result['contractor'],
+                    'project': result['project'],
+                    'description': result['description'],
+                    'file_type': result['file_type'],
+                    'file_size': result['file_size'],
+                    'scan_date': make_aware(datetime.now()),  # Make timezone aware
+                    'last_modified': result['last_modified'],
+                    'content_hash': result.get('content_hash', '')
+                }
+            )
+            ScanRun.objects.filter(pk=run.pk).update(
+                cursor=os.path.relpath(file_path, directory_path)
+            )
+        
+        if created:
+            logger.debug(f"Created new database entry for: {file_path}")
+        else:
+            logger.debug(f"Updated existing database entry for: {file_path}")
+            
+        processed_files.append(result)
+        stats['files_processed'] += 1
+        
+    except Exception as e:
+        logger.exception(f"Error saving to database: {str(e)}")
+        stats['errors'].append(f"Database error for {result['filename']}: {str(e)}")
+
+def scan_counters():
+    """Snapshot of the process-wide counters a scan reports the change in"""
+    return {'cache': description_cache.get_stats(), 'images': get_image_stats()}
+
+def finish_scan_run(run, stats, counters_start):
+    """Mark the run as completed and fill in the cache and image counters"""
+    run.status = ScanRun.STATUS_COMPLETED
+    run.save(update_fields=['status', 'updated_at'])
+    
+    cache_end = description_cache.get_stats()
+    stats['cache_hits'] = cache_end['hits'] - counters_start['cache']['hits']
+    stats['cache_misses'] = cache_end['misses'] - counters_start['cache']['misses']
+    stats['images'] = image_stats_since(counters_start['images'])
+    for file_type, image_stats in stats['images'].items():
+        logger.info(f"{file_type}: {image_stats['files']} images, "
+                    f"{image_stats['bytes_saved'] / (1024 * 1024):.1f} MB not sent, "
+                    f"prepare {image_stats['prepare_ms']} ms, describe {image_stats['describe_seconds']} s per image")
+    logger.info(f"Scan complete. Stats: {stats}")
+
+def scan_directory(directory_path, description_mode='detailed', cutoff_date=None,
+                   incremental=False, use_hash=False, resume=False, on_progress=None):
     """
     Scan files in directory and add them to database
     Returns a dict with statistics and list of processed files
+
+    With `incremental`, files already in the database are only described again
+    if their size or modification time changed. With `use_hash` as well, a
+    content hash is stored and files that were only touched are left alone.
+
+    Every scan is journaled as a ScanRun. With `resume`, the last unfinished
+    run for the same directory is continued after the last file it wrote,
+    using the options it was started with.
+    
+    `on_progress(stats, current_path)` is called after every file; if it
+    returns True the scan stops and the run is left open for resuming.
     """
     logger.info(f"Starting directory scan: {directory_path}")
     logger.info(f"Description mode: {description_mode}")
     logger.info(f"Cutoff date: {cutoff_date}")
+    logger.info(f"Incremental: {incremental}, content hash: {use_hash}")
     
     if cutoff_date is None:
         cutoff_date = CUTOFF_DATE
     
-    stats = {
-        'files_found': 0,
-        'files_processed': 0,
-        'files_skipped': 0,
-        'errors': []
-    }
+    run, options, start_after = start_scan_run(
+        directory_path, description_mode, cutoff_date, incremental, use_hash, resume
+    )
     
+    stats = new_scan_stats()
+    counters_start = scan_counters()
     processed_files = []
+    known_files = load_known_files(options['incremental'])
+    cancelled = False
     
     try:
         # Walk through directory tree
-        for root, dirs, files in os.walk(directory_path):
-            for filename in files:
-                try:
-                    stats['files_found'] += 1
-                    file_path = os.path.join(root, filename)
-                    
-                    # Check if file is valid
-                    if not is_valid_file(file_path):
-                        logger.debug(f"Skipping invalid file: {file_path}")
-                        stats['files_skipped'] += 1
-                        continue
-                    
-                    # Check if file modified after cutoff date - make timezone aware
-                    file_modified = make_aware(datetime.fromtimestamp(os.path.getmtime(file_path)))
-                    if cutoff_date and file_modified < cutoff_date:
-                        logger.debug(f"Skipping file older than cutoff: {file_path}")
-                        stats['files_skipped'] += 1
-                        continue
-                    
+        for entry in walk_files(directory_path, start_after=start_after):
+            filename = entry.name
+            try:
+                if should_process(entry, options, known_files, stats):
                     # Process the file
-                    logger.debug(f"Processing file: {file_path}")
-                    result = process_file(file_path, directory_path, description_mode)
+                    logger.debug(f"Processing file: {entry.path}")
+                    result = process_file(entry.path, directory_path, options['mode'], entry=entry)
+                    if options['use_hash']:
+                        result['content_hash'] = hash_file(entry.path)
                     
-                    # Create or update database entry
-                    try:
-                        # Try to get existing entry
-                        scan_result, created = ScanResult.objects.update_or_create(
-                            file_path=file_path,
-                            defaults={
-                                'filename': result['filename'],
-                                'contractor': result['contractor'],
-                                'project': result['project'],
-                                'description': result['description'],
-                                'file_type': result['file_type'],
-                                'file_size': result['file_size'],
-                                'scan_date': make_aware(datetime.now()),  # Make timezone aware
-                                'last_modified': result['last_modified']
-                            }
-                        )
-                        
-                        if created:
-                            logger.debug(f"Created new database entry for: {file_path}")
-                        else:
-                            logger.debug(f"Updated existing database entry for: {file_path}")
-                            
-                        processed_files.append(result)
-                        stats['files_processed'] += 1
-                        
-                    except Exception as e:
-                        logger.exception(f"Error saving to database: {str(e)}")
-                        stats['errors'].append(f"Database error for {filename}: {str(e)}")
-                
-                except Exception as e:
-                    logger.exception(f"Error processing file {filename}: {str(e)}")
-                    stats['errors'].append(f"Error processing {filename}: {str(e)}")
-        
-        logger.info(f"Scan complete. Stats: {stats}")
+                    save_result(result, directory_path, run, stats, processed_files)
+            
+            except Exception as e:
+                logger.exception(f"Error processing file {filename}: {str(e)}")
+                stats['errors'].append(f"Error processing {filename}: {str(e)}")
+            
+            if on_progress is not None and on_progress(stats, entry.path):
+                logger.info(f"Scan stopped on request. Stats: {stats}")
+                cancelled = True
+                break
+        
+        if not cancelled:
+            finish_scan_run(run, stats, counters_start)
         
     except Exception as e:
         logger.exception(f"Error scanning directory {directory_path}: {str(e)}")
@@ -167,5 +327,6 @@ def scan_directory(directory_path, description_mode='detailed', cutoff_date=None
     
     return {
         'stats': stats,
-        'processed_files': processed_files
-    } 
\ No newline at end of file
+        'processed_files': processed_files,
+        'cancelled': cancelled
+    }
@@ -0,0 +1,51 @@
+import re
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+# FTS5 table created by migration 0006, kept in sync with ScanResult by triggers
+FTS_TABLE = 'scanner_scanresult_fts'
+
+# Snippet markers; the highlight_snippet template filter turns them into <mark> tags
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+def fts_query(term):
+    """
+    Turn free text into an FTS5 query that matches every word, as a prefix.
+    Quoting each word keeps characters like '-' or '"' from being read as syntax.
+    """
+    words = re.findall(r'\w+', term or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_results(queryset, term):
+    """
+    Filter a ScanResult queryset to rows whose filename or description match
+    `term`, best match first. On SQLite this uses the full-text index and
+    annotates each row with `rank` (bm25, lower is better) and `snippet`.
+    Other databases fall back to a substring match on the description. Rows
+    are always annotated with `rank`, so callers can order by it; it is 0 when
+    there is nothing to rank by, including terms without any words.
+    """
+    query = fts_query(term)
+    no_rank = Value(0.0, output_field=FloatField())
+    if not query:
+        return queryset.annotate(rank=no_rank)
+    if connection.vendor != 'sqlite':
+        return queryset.filter(description__icontains=term).annotate(rank=no_rank)
+    
+    table = queryset.model._meta.db_table
+    matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (query,))
+    # Filename matches weigh more than matches in the description
+    rank = RawSQL(
+        f"SELECT bm25({FTS_TABLE}, 5.0, 1.0) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id", (query,)
+    )
+    snippet = RawSQL(
+        f"SELECT snippet({FTS_TABLE}, 1, %s, %s, '…', 16) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+        (SNIPPET_START, SNIPPET_END, query)
+    )
+    return (queryset.filter(id__in=matches)
+            .annotate(rank=rank, snippet=snippet)
+            .order_by('rank', '-scan_date'))
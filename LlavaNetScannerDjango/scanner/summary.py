@@ -0,0 +1,60 @@
+from django.db import connection
+from django.db.models import Count, Sum
+from .models import ScanResult, ScanSummary
+
+def summary_available():
+    """ScanSummary is only maintained where migration 0008 created its triggers"""
+    return connection.vendor == 'sqlite'
+
+def summary_metrics(contractors=None, projects=None, file_types=None, queryset=None):
+    """
+    Dashboard metrics and chart data for the results matching the filters.
+    Read from ScanSummary, one row per group, unless a filtered ScanResult
+    `queryset` is given (e.g. a text search, which the summary cannot answer)
+    or the summary is not maintained on this database.
+    """
+    if queryset is None and summary_available():
+        rows = ScanSummary.objects.all()
+        count, size = Sum('file_count'), Sum('total_size')
+    else:
+        rows = queryset if queryset is not None else ScanResult.objects.all()
+        count, size = Count('id'), Sum('file_size')
+    
+    if contractors:
+        rows = rows.filter(contractor__in=contractors)
+    if projects:
+        rows = rows.filter(project__in=projects)
+    if file_types:
+        rows = rows.filter(file_type__in=file_types)
+    
+    totals = rows.aggregate(total_records=count, total_size=size)
+    total_size_mb = round((totals['total_size'] or 0) / (1024 * 1024), 2)
+    
+    file_type_data = list(rows.values('file_type')
+                          .annotate(size=size)
+                          .order_by('-size'))
+    # Convert file sizes to MB
+    for item in file_type_data:
+        item['size'] = round((item['size'] or 0) / (1024 * 1024), 2)
+    
+    contractor_data = list(rows.values('contractor')
+                           .annotate(project_count=Count('project', distinct=True))
+                           .order_by('-project_count')[:10])
+    
+    return {
+        'total_records': totals['total_records'] or 0,
+        'unique_contractors': rows.values('contractor').distinct().count(),
+        'unique_projects': rows.values('project').distinct().count(),
+        'total_size_mb': total_size_mb,
+        'file_type_data': file_type_data,
+        'contractor_data': contractor_data,
+    }
+
+def filter_choices():
+    """Distinct contractors, projects and file types for the search form"""
+    source = ScanSummary.objects if summary_available() else ScanResult.objects
+    return (
+        source.values_list('contractor', flat=True).distinct(),
+        source.values_list('project', flat=True).distinct(),
+        source.values_list('file_type', flat=True).distinct(),
+    )
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from scanner.search import SNIPPET_START, SNIPPET_END
+
+register = template.Library()
+
+@register.filter
+def highlight_snippet(value):
+    """Escape a search snippet and wrap its matched words in <mark> tags"""
+    html = escape(value or '')
+    return mark_safe(html.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('scan/', views.scan_new_directory, name='scan_directory'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/cancel/', views.cancel_job, name='cancel_job'),
     path('export-csv/', views.export_csv, name='export_csv'),
     path('open-location/', views.open_location, name='open_location'),
     path('test-ollama/', views.test_ollama, name='test_ollama'),
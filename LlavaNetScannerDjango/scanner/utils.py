@@ -5,6 +5,10 @@ from django.conf import settings
 from django.utils.timezone import make_aware
 import subprocess
 import platform
+# Shared with the Streamlit scanner in the repository root, see settings.py
+from file_walker import walk_files
+from file_hasher import hash_file
+from image_preprocessor import prepare_image, MAX_IMAGE_SIDE
 
 # Add constant for cutoff date - make timezone aware
 CUTOFF_DATE = make_aware(datetime(2023, 10, 1))
@@ -28,16 +32,17 @@ def is_text_file(filename):
     text_extensions = ('.txt', '.doc', '.docx')
     return filename.lower().endswith(text_extensions)
 
+# Check if the filename has one of the valid file types
+def has_valid_extension(filename):
+    return is_image_file(filename) or is_design_file(filename) or is_pdf_file(filename)
+
 # Check if the file is one of the valid file types
 def is_valid_file(file_path):
     """Check if the file is valid and exists"""
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         return False
         
-    filename = os.path.basename(file_path)
-    if is_image_file(filename) or is_design_file(filename) or is_pdf_file(filename):
-        return True
-    return False
+    return has_valid_extension(os.path.basename(file_path))
 
 def open_file_location(path):
     """Open the folder containing the file in the system's file explorer"""
@@ -1,28 +1,33 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.db.models import Count, Sum, Q
-from django.utils.timezone import make_aware
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.utils import timezone
 from datetime import datetime
-import pandas as pd
+import csv
 import json
 import os
 import logging
 
-from .models import ScanResult
+from .models import ScanResult, ScanJob
 from .forms import ScanDirectoryForm, SearchForm
-from .scanner_service import scan_directory
+from .jobs import submit_scan_job
+from .search import search_results
+from .pagination import keyset_page
+from .summary import summary_metrics, filter_choices
 from .utils import open_file_location
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Rows fetched from the database at a time when exporting
+EXPORT_CHUNK_SIZE = 2000
+
 def index(request):
     """Main page with tabs for database view and scanning"""
     # Get unique values for form choices
-    contractor_choices = ScanResult.objects.values_list('contractor', flat=True).distinct()
-    project_choices = ScanResult.objects.values_list('project', flat=True).distinct()
-    file_type_choices = ScanResult.objects.values_list('file_type', flat=True).distinct()
+    contractor_choices, project_choices, file_type_choices = filter_choices()
     
     # Initialize forms
     scan_form = ScanDirectoryForm()
@@ -34,6 +39,8 @@ def index(request):
     
     # Initialize with all results (will be filtered if search is submitted)
     queryset = ScanResult.objects.all()
+    ordering = ['-scan_date', '-id']
+    search_term = contractors = projects = file_types = None
     
     # Handle search form submission
     if request.method == 'GET' and 'search' in request.GET:
@@ -53,7 +60,9 @@ def index(request):
             
             # Apply filters
             if search_term:
-                queryset = queryset.filter(description__icontains=search_term)
+                queryset = search_results(queryset, search_term)
+                # Best match first, with the id as a stable tiebreaker
+                ordering = ['rank', '-id']
             if contractors:
                 queryset = queryset.filter(contractor__in=contractors)
             if projects:
@@ -61,37 +70,43 @@ def index(request):
             if file_types:
                 queryset = queryset.filter(file_type__in=file_types)
     
-    # Calculate summary metrics
-    total_records = queryset.count()
-    unique_contractors = queryset.values('contractor').distinct().count()
-    unique_projects = queryset.values('project').distinct().count()
-    total_size_mb = queryset.aggregate(total=Sum('file_size'))['total'] or 0
-    total_size_mb = round(total_size_mb / (1024 * 1024), 2)
-    
-    # Prepare data for charts
-    file_type_data = list(queryset.values('file_type')
-                        .annotate(size=Sum('file_size'))
-                        .order_by('-size'))
+    # Only the listed columns, with descriptions cut short in the database
+    page_queryset = queryset.only(
+        'id', 'filename', 'file_path', 'file_type', 'contractor', 'project', 'file_size', 'scan_date'
+    ).annotate(description_preview=Substr('description', 1, 101))
+    results, next_cursor = keyset_page(page_queryset, ordering, request.GET.get('after'))
     
-    # Convert file sizes to MB
-    for item in file_type_data:
-        item['size'] = round(item['size'] / (1024 * 1024), 2)
+    next_page_query = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['after'] = next_cursor
+        next_page_query = query.urlencode()
+    first_page_query = None
+    if 'after' in request.GET:
+        query = request.GET.copy()
+        del query['after']
+        first_page_query = query.urlencode()
     
-    contractor_data = list(queryset.values('contractor')
-                          .annotate(project_count=Count('project', distinct=True))
-                          .order_by('-project_count')[:10])
+    # Summary metrics and chart data; only a text search needs the results themselves
+    if search_term:
+        metrics = summary_metrics(queryset=queryset)
+    else:
+        metrics = summary_metrics(contractors, projects, file_types)
     
     context = {
         'scan_form': scan_form,
         'search_form': search_form,
-        'results': queryset,
-        'total_records': total_records,
-        'unique_contractors': unique_contractors,
-        'unique_projects': unique_projects,
-        'total_size_mb': total_size_mb,
-        'file_type_data': json.dumps(file_type_data),
-        'contractor_data': json.dumps(contractor_data),
-        'active_tab': 'database' if 'search' in request.GET else 'scan'
+        'results': results,
+        'next_page_query': next_page_query,
+        'first_page_query': first_page_query,
+        'total_records': metrics['total_records'],
+        'unique_contractors': metrics['unique_contractors'],
+        'unique_projects': metrics['unique_projects'],
+        'total_size_mb': metrics['total_size_mb'],
+        'file_type_data': json.dumps(metrics['file_type_data']),
+        'contractor_data': json.dumps(metrics['contractor_data']),
+        'latest_job': ScanJob.objects.first(),
+        'active_tab': 'database' if 'search' in request.GET or 'after' in request.GET else 'scan'
     }
     
     return render(request, 'scanner/index.html', context)
@@ -107,6 +122,10 @@ def scan_new_directory(request):
             directory_path = form.cleaned_data['directory_path']
             description_mode = form.cleaned_data['description_mode']
             cutoff_date = form.cleaned_data['cutoff_date']
+            incremental = form.cleaned_data['incremental']
+            use_hash = form.cleaned_data['use_hash']
+            resume = form.cleaned_data['resume']
+            concurrency = form.cleaned_data['concurrency']
             
             logger.debug(f"Directory path: {directory_path}")
             logger.debug(f"Description mode: {description_mode}")
@@ -118,35 +137,26 @@ def scan_new_directory(request):
                 messages.error(request, "Directory does not exist")
                 return redirect('index')
             
-            # Convert cutoff_date to datetime
-            cutoff_datetime = make_aware(datetime.combine(cutoff_date, datetime.min.time()))
-            
             try:
-                # Scan the directory
-                logger.debug("Starting directory scan")
-                result = scan_directory(
-                    directory_path, 
-                    description_mode, 
-                    cutoff_datetime
-                )
-                logger.debug(f"Scan results: {result['stats']}")
-                
-                # Display success message with stats
+                # Queue the scan; a background worker runs it so it survives the browser going away
+                job = submit_scan_job(directory_path, {
+                    'description_mode': description_mode,
+                    'cutoff_date': datetime.combine(cutoff_date, datetime.min.time()).isoformat(),
+                    'incremental': incremental,
+                    'use_hash': use_hash,
+                    'resume': resume,
+                    'concurrency': concurrency
+                })
+                logger.debug(f"Submitted scan job {job.pk}")
                 messages.success(
-                    request, 
-                    f"Scan complete! Found {result['stats']['files_found']} files, "
-                    f"processed {result['stats']['files_processed']} files, "
-                    f"skipped {result['stats']['files_skipped']} files."
+                    request,
+                    f"Scan of {directory_path} started. Progress is shown below and the "
+                    f"scan keeps running if you close this page."
                 )
                 
-                # Add any errors as warnings
-                for error in result['stats']['errors']:
-                    logger.warning(f"Scan error: {error}")
-                    messages.warning(request, error)
-                
             except Exception as e:
-                logger.exception(f"Error scanning directory: {str(e)}")
-                messages.error(request, f"Error scanning directory: {str(e)}")
+                logger.exception(f"Error starting scan: {str(e)}")
+                messages.error(request, f"Error starting scan: {str(e)}")
                 
             return redirect('index')
         else:
@@ -160,6 +170,35 @@ def scan_new_directory(request):
     # If not POST or form invalid, redirect to index
     return redirect('index')
 
+def job_status(request, job_id):
+    """Return the progress of a scan job as JSON for the scan tab to poll"""
+    job = get_object_or_404(ScanJob, pk=job_id)
+    return JsonResponse(job.to_progress())
+
+def cancel_job(request, job_id):
+    """Ask a running scan job to stop after the file it is working on"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=405)
+    
+    job = get_object_or_404(ScanJob, pk=job_id)
+    if job.status == ScanJob.STATUS_QUEUED:
+        # Not started yet, so it can be cancelled straight away
+        ScanJob.objects.filter(pk=job.pk, status=ScanJob.STATUS_QUEUED).update(
+            status=ScanJob.STATUS_CANCELLED, cancel_requested=True, finished_at=timezone.now()
+        )
+    elif job.status == ScanJob.STATUS_RUNNING:
+        ScanJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+    else:
+        return JsonResponse({'success': False, 'status': job.status})
+    
+    logger.info(f"Cancel requested for scan job {job.pk}")
+    return JsonResponse({'success': True})
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer rows can be streamed"""
+    def write(self, value):
+        return value
+
 def export_csv(request):
     """Export filtered results as CSV"""
     # Get the queryset based on the same filters from index view
@@ -167,9 +206,7 @@ def export_csv(request):
     
     # Apply search filters if any
     if request.GET:
-        contractor_choices = ScanResult.objects.values_list('contractor', flat=True).distinct()
-        project_choices = ScanResult.objects.values_list('project', flat=True).distinct()
-        file_type_choices = ScanResult.objects.values_list('file_type', flat=True).distinct()
+        contractor_choices, project_choices, file_type_choices = filter_choices()
         
         search_form = SearchForm(
             request.GET,
@@ -187,7 +224,7 @@ def export_csv(request):
             
             # Apply filters
             if search_term:
-                queryset = queryset.filter(description__icontains=search_term)
+                queryset = search_results(queryset, search_term)
             if contractors:
                 queryset = queryset.filter(contractor__in=contractors)
             if projects:
@@ -195,25 +232,23 @@ def export_csv(request):
             if file_types:
                 queryset = queryset.filter(file_type__in=file_types)
     
-    # Convert to DataFrame
-    data = list(queryset.values(
-        'filename', 'file_path', 'contractor', 'project', 'description',
-        'file_type', 'file_size', 'scan_date', 'last_modified'
-    ))
+    # Stream rows straight from the database cursor; nothing is collected in memory
+    fields = ['filename', 'file_path', 'contractor', 'project', 'description',
+              'file_type', 'file_size', 'scan_date', 'last_modified']
+    header = [name if name != 'file_size' else 'size_mb' for name in fields]
+    size_index = fields.index('file_size')
+    writer = csv.writer(Echo())
     
-    df = pd.DataFrame(data)
+    def rows():
+        yield writer.writerow(header)
+        for row in queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            row = list(row)
+            # Convert file size to MB
+            row[size_index] = round(row[size_index] / (1024 * 1024), 2)
+            yield writer.writerow(row)
     
-    # Convert file size to MB
-    if not df.empty and 'file_size' in df.columns:
-        df['file_size'] = df['file_size'] / (1024 * 1024)
-        df['file_size'] = df['file_size'].round(2)
-        df = df.rename(columns={'file_size': 'size_mb'})
-    
-    # Create a response with CSV content
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="scan_results.csv"'
-    
-    df.to_csv(path_or_buf=response, index=False)
     return response
 
 def open_location(request):
@@ -1,14 +1,20 @@
 import os
-import pandas as pd
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from image_describer import generate_description
-from design_describer import describe_design
-from pdf_describer import describe_pdf
+from file_hasher import hash_file
+from description_cache import get_cache
+from file_walker import walk_files
 from dotenv import load_dotenv
 
 # Add constant for cutoff date
 CUTOFF_DATE = datetime(2023, 10, 1)
 
+# Number of describe calls kept in flight against the Ollama server
+DESCRIBE_WORKERS = int(os.getenv('DESCRIBE_WORKERS', '4'))
+
 #Check for image files
 def is_image_file(filename):
     image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
@@ -34,8 +40,11 @@ def is_valid_file(filename):
         return True 
 
 #Process the file and return the row of data
-def process_file(file_path, directory):
-    """Process a file and return its metadata and description"""
+def process_file(file_path, directory, description_mode='detailed', file_size=None):
+    """
+    Process a file and return its metadata and description. description_mode
+    styles image descriptions; file_size is the size from the directory walk.
+    """
     try:
         relative_path = os.path.relpath(file_path, directory)
         path_parts = relative_path.split(os.sep)
@@ -45,14 +54,19 @@ def process_file(file_path, directory):
         # Get the actual filename from the path
         filename = os.path.basename(file_path)
         
-        # Get file description based on type
+        # Get file description based on type. The describers pull in ollama,
+        # PyMuPDF and Pillow, so they are imported on first use
         description = ''
+        pages = []
         if is_image_file(filename):
-            description = generate_description(file_path, mode='detailed')
+            from image_describer import generate_description
+            description = generate_description(file_path, mode=description_mode, file_size=file_size)
         elif is_design_file(filename):
+            from design_describer import describe_design
             description = describe_design(file_path)
         elif is_pdf_file(filename):
-            description = describe_pdf(file_path)
+            from pdf_describer import describe_pdf
+            description = describe_pdf(file_path, page_descriptions=pages)
         else:
             description = 'Unknown file type'
             
@@ -66,6 +80,10 @@ def process_file(file_path, directory):
             'file_type': os.path.splitext(filename)[1].lower()
         }
         
+        # Descriptions of individual pages of a scanned PDF
+        if pages:
+            result['Pages'] = pages
+        
         return result
         
     except Exception as e:
@@ -80,70 +98,298 @@ def process_file(file_path, directory):
             'file_type': os.path.splitext(file_path)[1].lower()
         }
 
-def scan_files_in_directory(directory_path, db):
+def is_unchanged(known, file_size, mtime):
+    """Check a stored result's size and modification time against a fresh stat"""
+    if known['file_size'] != file_size or not known['last_modified']:
+        return False
+    try:
+        stored_mtime = datetime.fromisoformat(str(known['last_modified'])).timestamp()
+    except ValueError:
+        return False
+    return abs(stored_mtime - mtime) < 0.001
+
+def describe_file(entry, directory, with_hash=False, description_mode='detailed'):
+    """Run process_file on a walked entry and attach its stat data and optional content hash"""
+    result = process_file(entry.path, directory, description_mode, entry.size)
+    result['_file_stats'] = {'size': entry.size, 'mtime': entry.mtime}
+    if with_hash:
+        result['content_hash'] = hash_file(entry.path)
+    return result
+
+def matches_duplicate(entry, duplicate):
+    """Check that a walked file still has the size and content recorded for its duplicate group"""
+    if entry.size != duplicate['file_size']:
+        return False
+    try:
+        return hash_file(entry.path) == duplicate['content_hash']
+    except OSError:
+        return False
+
+def copy_duplicate(entry, directory, description, content_hash):
+    """Build the result for a file whose identical copy was already described"""
+    relative_path = os.path.relpath(entry.path, directory)
+    path_parts = relative_path.split(os.sep)
+    return {
+        'Filename': entry.name,
+        'Path': entry.path,
+        'Contractor': path_parts[0] if len(path_parts) >= 2 else 'unknown',
+        'Project': path_parts[1] if len(path_parts) >= 3 else 'unknown',
+        'Description': description,
+        'file_type': os.path.splitext(entry.name)[1].lower(),
+        'content_hash': content_hash,
+        '_file_stats': {'size': entry.size, 'mtime': entry.mtime}
+    }
+
+def scan_files_in_directory(directory_path, db, workers=DESCRIBE_WORKERS,
+                            incremental=False, use_hash=False, stats=None,
+                            resume=False, description_mode='detailed'):
     """
     Scan files in directory and add them directly to database
+
+    Up to `workers` files are described concurrently; results are written to
+    the database by this thread, in the order the files were found.
+
+    By default files already in the database are skipped. With `incremental`,
+    files whose size or modification time changed are described again; with
+    `use_hash` as well, a content hash is stored and checked so that files that
+    were only touched are not. Pass a dict as `stats` to receive the counters.
+
+    Every run is journaled in the database. With `resume`, the last unfinished
+    run for the same directory is continued after the last file it wrote, using
+    the options it was started with. `description_mode` (detailed, concise or
+    creative) sets the style of image descriptions.
+
+    Files recorded as duplicates (see duplicate_finder) get the description of
+    an already described copy instead of a new one from the model.
     """
     data = []
     files_found = 0
     files_processed = 0
     files_skipped = 0
+    files_new = 0
+    files_changed = 0
+    files_unchanged = 0
+    files_copied = 0
     
     print("\nStarting directory scan...")
+    start_time = time.perf_counter()
+    cache = get_cache()
+    cache.reset_stats()
+    from image_preprocessor import get_preprocess_stats
+    image_stats = get_preprocess_stats()
+    image_stats.reset()
     
     # Convert to absolute path to avoid any path resolution issues
     directory_path = os.path.abspath(directory_path)
     processed_paths = set()
+    workers = max(1, int(workers))
     
-    for root, _, files in os.walk(directory_path):
-        for filename in files:
-            file_path = os.path.abspath(os.path.join(root, filename))
-            
-            if file_path in processed_paths:
-                continue
-                
-            files_found += 1
-            print(f"\nFound file ({files_found}): {filename}")
-            print(f"Full path: {file_path}")
-            
-            # Check if file is valid and newer than cutoff date
-            if (is_valid_file(filename) and 
-                os.path.getctime(file_path) > CUTOFF_DATE.timestamp()):
+    # Journal the run so it can be continued if the process stops part way
+    run = db.get_resumable_scan_run(directory_path) if resume else None
+    if run:
+        run_id = run['id']
+        start_after = run['cursor']
+        cutoff_date = datetime.fromisoformat(run['options']['cutoff'])
+        incremental = run['options']['incremental']
+        use_hash = run['options']['use_hash']
+        description_mode = run['options'].get('mode', description_mode)
+        print(f"Resuming scan run {run_id} after: {start_after or 'start'}")
+    else:
+        start_after = None
+        cutoff_date = CUTOFF_DATE
+        run_id = db.start_scan_run(directory_path, {
+            'mode': description_mode,
+            'cutoff': cutoff_date.isoformat(),
+            'incremental': incremental,
+            'use_hash': use_hash
+        })
+    
+    # Load the paths already in the database once instead of querying per file
+    known_files = db.get_known_files()
+    print(f"Loaded {len(known_files)} known files from database")
+    
+    # Content hashes of recorded duplicates, and a description for each group already described
+    duplicate_files = db.get_duplicate_files()
+    duplicate_descriptions = db.get_duplicate_descriptions()
+    
+    # Futures waiting to be written, oldest first
+    pending = deque()
+    files_described = 0
+    
+    def wait_for_result(filename, future):
+        """Wait for a describe call to finish and return its result, or None on error"""
+        nonlocal files_described, files_skipped
+        try:
+            result = future.result()
+            files_described += 1
+            return result
+        except Exception as e:
+            print(f"❌ Error processing {filename}: {str(e)}")
+            files_skipped += 1
+            return None
+    
+    def record_result(result):
+        """Count a result once its row has been written"""
+        nonlocal files_processed
+        files_processed += 1
+        print(f"✅ Added to database: {result['Filename']}")
+        data.append(result)
+        
+        # Later copies of this file can reuse its description
+        duplicate = duplicate_files.get(result['Path'].lower())
+        content_hash = duplicate['content_hash'] if duplicate else None
+        if content_hash and not result['Description'].startswith('Error processing file'):
+            duplicate_descriptions.setdefault(content_hash, result['Description'])
+        # Committed with the same batch as the row itself
+        db.set_scan_run_cursor(run_id, os.path.relpath(result['Path'], directory_path))
+    
+    def finished_results(keep):
+        """
+        Yield the results of the oldest futures until only `keep` are pending.
+        None is yielded before waiting on a future that has not finished, so
+        the writer commits first and the workers' cache writes are not locked out.
+        """
+        while len(pending) > keep:
+            filename, future = pending.popleft()
+            if not future.done():
+                yield None
+            result = wait_for_result(filename, future)
+            if result is not None:
+                yield result
+    
+    def described_results():
+        """Walk the tree, describe files in the pool and yield results in the order found"""
+        nonlocal files_found, files_skipped, files_new, files_changed, files_unchanged, files_copied
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for entry in walk_files(directory_path, start_after=start_after):
+                file_path = entry.path
+                filename = entry.name
                 
-                # Check if file already exists in database
-                existing_results = db.get_results({'file_path': file_path})
-                if existing_results:
-                    files_skipped += 1
-                    print(f"⏭️  Skipping existing file: {filename}")
-                    processed_paths.add(file_path)
+                if file_path in processed_paths:
                     continue
+                    
+                files_found += 1
+                print(f"\nFound file ({files_found}): {filename}")
+                print(f"Full path: {file_path}")
                 
-                print(f"🔍 Processing: {filename}")
-                try:
-                    result = process_file(file_path, directory_path)
-                    db.add_scan_result(result)
-                    files_processed += 1
-                    print(f"✅ Added to database: {result['Filename']}")
+                # Check if file is valid and newer than cutoff date
+                if (is_valid_file(filename) and 
+                    entry.ctime > cutoff_date.timestamp()):
+                    
+                    # Check if file already exists in database
+                    known = known_files.get(file_path.lower())
+                    if known and not incremental:
+                        files_skipped += 1
+                        print(f"⏭️  Skipping existing file: {filename}")
+                        processed_paths.add(file_path)
+                        continue
+                    
+                    if known:
+                        unchanged = is_unchanged(known, entry.size, entry.mtime)
+                        
+                        # A touched but identical file only needs its stats refreshed
+                        if (not unchanged and use_hash and known['content_hash'] and
+                                known['file_size'] == entry.size and
+                                hash_file(file_path) == known['content_hash']):
+                            db.touch_scan_result(file_path, entry.size,
+                                                 datetime.fromtimestamp(entry.mtime))
+                            unchanged = True
+                        
+                        if unchanged:
+                            files_unchanged += 1
+                            files_skipped += 1
+                            print(f"⏭️  Skipping unchanged file: {filename}")
+                            processed_paths.add(file_path)
+                            continue
+                        
+                        files_changed += 1
+                        print(f"🔄 Processing changed file: {filename}")
+                    else:
+                        files_new += 1
+                        print(f"🔍 Processing: {filename}")
+                    
+                    # A file changed since its duplicate group was recorded leaves the group,
+                    # so neither it nor its new description is mixed up with the copies
+                    duplicate = duplicate_files.get(file_path.lower())
+                    if duplicate and not matches_duplicate(entry, duplicate):
+                        print(f"🔄 No longer a duplicate: {filename}")
+                        db.remove_duplicate_file(file_path)
+                        del duplicate_files[file_path.lower()]
+                        duplicate = None
+                    
+                    # An identical copy was described already; queued as a finished
+                    # future so results are still written in the order found
+                    content_hash = duplicate['content_hash'] if duplicate else None
+                    if content_hash in duplicate_descriptions:
+                        files_copied += 1
+                        print(f"📋 Copying description from a duplicate: {filename}")
+                        future = Future()
+                        future.set_result(copy_duplicate(entry, directory_path,
+                                                         duplicate_descriptions[content_hash],
+                                                         content_hash))
+                        pending.append((filename, future))
+                    else:
+                        pending.append((filename, executor.submit(describe_file, entry,
+                                                                  directory_path, use_hash,
+                                                                  description_mode)))
                     processed_paths.add(file_path)
-                    data.append(result)
-                except Exception as e:
-                    print(f"❌ Error processing {filename}: {str(e)}")
+                    
+                    # Keep the walk at most a couple of batches ahead of the describers
+                    yield from finished_results(2 * workers - 1)
+                else:
                     files_skipped += 1
+                    print(f"⏭️  Skipping invalid or old file: {filename}")
                     processed_paths.add(file_path)
-            else:
-                files_skipped += 1
-                print(f"⏭️  Skipping invalid or old file: {filename}")
-                processed_paths.add(file_path)
+            
+            yield from finished_results(0)
+    
+    # One writer commits the results in batches while the pool keeps describing
+    db.add_scan_results(described_results(), on_written=record_result)
+    db.finish_scan_run(run_id)
+    
+    # Results that were described but could not be written count as skipped
+    files_skipped += files_described - files_processed
+    
+    elapsed = time.perf_counter() - start_time
+    rate = files_processed / elapsed if elapsed > 0 else 0.0
     
     print(f"\nScan Complete!")
     print(f"Files found: {files_found}")
     print(f"Files processed: {files_processed}")
     print(f"Files skipped: {files_skipped}")
+    if incremental:
+        print(f"New: {files_new}, changed: {files_changed}, unchanged: {files_unchanged}")
+    if files_copied:
+        print(f"Descriptions copied from duplicates: {files_copied}")
+    print(f"Description cache: {cache.hits} hits, {cache.misses} misses "
+          f"({cache.hit_rate():.0%} hit rate)")
+    print(f"Elapsed: {elapsed:.1f}s ({rate:.2f} files/sec)")
+    image_report = image_stats.report()
+    if image_report:
+        print("Images sent to llava by file type:")
+        for line in image_report:
+            print(f"  {line}")
+    
+    if stats is not None:
+        stats.update({
+            'run_id': run_id,
+            'files_found': files_found,
+            'files_processed': files_processed,
+            'files_skipped': files_skipped,
+            'files_new': files_new,
+            'files_changed': files_changed,
+            'files_unchanged': files_unchanged,
+            'files_copied': files_copied,
+            'cache_hits': cache.hits,
+            'cache_misses': cache.misses,
+            'elapsed': elapsed,
+            'files_per_sec': rate,
+            'image_report': image_report
+        })
     
     return data
 
 if __name__ == "__main__":
-    directory_to_scan = r"your file path"
-    output_csv_file = r'ouput.csv'
-    df = pd.DataFrame(scan_files_in_directory(directory_to_scan))
-    df.to_csv(output_csv_file, index=False)
\ No newline at end of file
+    # Same as `python netscanner_cli.py scan ...`
+    from netscanner_cli import main
+    sys.exit(main(['scan'] + sys.argv[1:]))
\ No newline at end of file
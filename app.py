@@ -4,18 +4,80 @@ import pandas as pd
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from NetScanner import scan_files_in_directory, is_image_file, is_design_file, is_pdf_file
-from image_describer import generate_description
-from design_describer import describe_design
-from pdf_describer import describe_pdf
+from NetScanner import scan_files_in_directory
 from database import Database
+from embeddings import get_index
+import NetScanner
 import subprocess
 import platform
 
 st.set_page_config(page_title="LlavaNetScanner", layout="wide")
 
+# Rows shown for a semantic search
+SEMANTIC_RESULTS = 50
+
+SUMMARY_COLUMNS = ['file_type', 'contractor', 'project', 'file_count', 'total_size']
+
+@st.cache_resource
+def get_database():
+    """One Database per server process, so its connections outlive reruns"""
+    return Database()
+
 # Initialize database
-db = Database()
+db = get_database()
+
+# The loaders below take db.data_version() as their first argument. It is only
+# there to key the cache: a rerun with nothing written since reuses the last
+# result, and any commit (such as a finished scan) makes the next call reload.
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_results(version):
+    """All results as a DataFrame with sizes in MB, or None if there are none"""
+    results = db.get_results()
+    if not results:
+        return None
+    df = pd.DataFrame(results)
+    
+    # Convert file sizes to MB
+    df['file_size'] = df['file_size'] / (1024 * 1024)
+    df['file_size'] = df['file_size'].round(2)
+    return df.rename(columns={'file_size': 'size_mb'})
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_summary(version, contractors=(), projects=(), file_types=()):
+    """Summary groups matching the filters, with total sizes in MB"""
+    summary = pd.DataFrame(
+        db.get_summary({'contractors': contractors, 'projects': projects, 'file_types': file_types}),
+        columns=SUMMARY_COLUMNS
+    )
+    summary['size_mb'] = summary['total_size'] / (1024 * 1024)
+    return summary
+
+def build_charts(chart_data):
+    """Storage by file type and top contractors, from results or summary groups"""
+    # File types distribution
+    fig1 = px.pie(
+        chart_data, 
+        names='file_type',
+        values='size_mb',
+        title='Storage by File Type'
+    )
+    
+    # Top contractors by project count
+    contractor_projects = chart_data.groupby('contractor')['project'].nunique().sort_values(ascending=False).head(10)
+    fig2 = px.bar(
+        x=contractor_projects.index,
+        y=contractor_projects.values,
+        title='Top 10 Contractors by Number of Projects',
+        labels={'x': 'Contractor', 'y': 'Number of Projects'}
+    )
+    fig2.update_layout(showlegend=False)
+    return fig1, fig2
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def summary_charts(version, contractors=(), projects=(), file_types=()):
+    """Charts for the filtered summary groups"""
+    return build_charts(load_summary(version, contractors, projects, file_types))
 
 def open_file_location(path):
     """Open the folder containing the file in the system's file explorer"""
@@ -41,26 +103,21 @@ def main():
     with tab1:
         st.subheader("Database Contents")
         
-        # Get all results from database
-        results = db.get_results()
-        if results:
-            df = pd.DataFrame(results)
-            
-            # Convert file sizes to MB
-            df['file_size'] = df['file_size'] / (1024 * 1024)
-            df['file_size'] = df['file_size'].round(2)
-            df = df.rename(columns={'file_size': 'size_mb'})
-            
-            # Add summary metrics
+        # Get all results from database, reloaded only after a write
+        version = db.data_version()
+        df = load_results(version)
+        if df is not None:
+            # Add summary metrics, read from the per-group totals instead of every row
+            summary = load_summary(version)
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Total Records", len(df))
+                st.metric("Total Records", int(summary['file_count'].sum()))
             with col2:
-                st.metric("Unique Contractors", df['contractor'].nunique())
+                st.metric("Unique Contractors", summary['contractor'].nunique())
             with col3:
-                st.metric("Unique Projects", df['project'].nunique())
+                st.metric("Unique Projects", summary['project'].nunique())
             with col4:
-                st.metric("Total Size (MB)", f"{df['size_mb'].sum():.2f}")
+                st.metric("Total Size (MB)", f"{summary['size_mb'].sum():.2f}")
             
             # Filters in sidebar
             st.sidebar.header("Filters")
@@ -68,19 +125,19 @@ def main():
             # Contractor filter
             contractors = st.sidebar.multiselect(
                 "Select Contractors",
-                options=sorted(df['contractor'].unique())
+                options=sorted(summary['contractor'].unique())
             )
             
             # Project filter
             projects = st.sidebar.multiselect(
                 "Select Projects",
-                options=sorted(df['project'].unique())
+                options=sorted(summary['project'].unique())
             )
             
             # File type filter
             file_types = st.sidebar.multiselect(
                 "Select File Types",
-                options=sorted(df['file_type'].unique())
+                options=sorted(summary['file_type'].unique())
             )
             
             # Apply filters
@@ -93,15 +150,42 @@ def main():
             
             # Search functionality
             search_term = st.text_input("Search descriptions:")
-            if search_term:
-                df = df[df['description'].str.contains(search_term, case=False, na=False)]
+            semantic = st.checkbox(
+                "Match meaning, not just words",
+                help="Finds descriptions with a similar meaning, e.g. 'balustrade' for 'handrail'"
+            )
+            columns = [
+                'filename', 'file_path', 'contractor', 'project', 'description',
+                'file_type', 'size_mb', 'scan_date', 'last_modified'
+            ]
+            if search_term and semantic:
+                # Closest descriptions from the embedding index, best first
+                index = get_index(db.db_file)
+                with st.spinner("Embedding new descriptions..."):
+                    index.update(db)
+                matches = pd.DataFrame(
+                    [{'id': row['id'], 'snippet': f"{row['score']:.2f} similarity"}
+                     for row in index.search(db, search_term, k=SEMANTIC_RESULTS)],
+                    columns=['id', 'snippet']
+                )
+                df = matches.merge(df, on='id')
+                columns = ['filename', 'snippet'] + columns[1:]
+            elif search_term:
+                # Ranked matches from the full-text index, best first
+                matches = pd.DataFrame(
+                    [{'id': row['id'], 'snippet': row['snippet']}
+                     for row in db.get_results({'search': search_term})],
+                    columns=['id', 'snippet']
+                )
+                # Scanned PDFs also match on the descriptions of their pages
+                page_matches = {row['file_path'] for row in db.search_pdf_pages(search_term)}
+                pages_only = df[df['file_path'].isin(page_matches) & ~df['id'].isin(matches['id'])]
+                df = pd.concat([matches.merge(df, on='id'), pages_only.assign(snippet='')])
+                columns = ['filename', 'snippet'] + columns[1:]
             
             # Display filtered data
             st.dataframe(
-                df[[
-                    'filename', 'file_path', 'contractor', 'project', 'description',
-                    'file_type', 'size_mb', 'scan_date', 'last_modified'
-                ]],
+                df[columns],
                 use_container_width=True,
                 column_config={
                     "filename": st.column_config.Column(
@@ -114,6 +198,11 @@ def main():
                         help="Full path to file",
                         width="large"
                     ),
+                    "snippet": st.column_config.Column(
+                        "Match",
+                        help="Matching words are marked with « »",
+                        width="large"
+                    ),
                     "size_mb": st.column_config.NumberColumn("Size (MB)"),
                     "scan_date": st.column_config.DatetimeColumn("Scan Date"),
                     "last_modified": st.column_config.DatetimeColumn("Last Modified")
@@ -124,26 +213,16 @@ def main():
             st.subheader("Data Analysis")
             col1, col2 = st.columns(2)
             
+            # Without a search the filtered groups give the same charts as the rows
+            if search_term:
+                fig1, fig2 = build_charts(df)
+            else:
+                fig1, fig2 = summary_charts(version, tuple(contractors), tuple(projects), tuple(file_types))
+            
             with col1:
-                # File types distribution
-                fig1 = px.pie(
-                    df, 
-                    names='file_type',
-                    values='size_mb',
-                    title='Storage by File Type'
-                )
                 st.plotly_chart(fig1, use_container_width=True)
             
             with col2:
-                # Top contractors by project count
-                contractor_projects = df.groupby('contractor')['project'].nunique().sort_values(ascending=False).head(10)
-                fig2 = px.bar(
-                    x=contractor_projects.index,
-                    y=contractor_projects.values,
-                    title='Top 10 Contractors by Number of Projects',
-                    labels={'x': 'Contractor', 'y': 'Number of Projects'}
-                )
-                fig2.update_layout(showlegend=False)
                 st.plotly_chart(fig2, use_container_width=True)
             
             # Download filtered results
@@ -164,7 +243,7 @@ def main():
         directory_path = st.text_input("Enter Directory Path to Scan")
         
         # Scan Settings
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             description_mode = st.radio(
                 "Description Style",
@@ -180,91 +259,92 @@ def main():
                 "Process files after date",
                 value=datetime(2023, 10, 1)
             )
+        with col3:
+            describe_workers = st.number_input(
+                "Concurrent describe calls",
+                min_value=1,
+                max_value=32,
+                value=NetScanner.DESCRIBE_WORKERS,
+                help="Number of files sent to Ollama at the same time"
+            )
+        
+        incremental = st.checkbox(
+            "Re-describe changed files",
+            help="Compare size and modification time with the database and describe new or changed files again"
+        )
+        use_hash = st.checkbox(
+            "Verify changes with a content hash",
+            disabled=not incremental,
+            help="Skip files whose contents are identical even if their modification time changed"
+        )
+        resume = st.checkbox(
+            "Resume interrupted scan",
+            help="Continue the last unfinished scan of this directory with the settings it was started with"
+        )
         
         if st.button("Start Scan"):
             if not directory_path or not os.path.exists(directory_path):
                 st.error("Please enter a valid directory path")
                 return
+            
+            # A resumed scan keeps the description style it was started with
+            if resume:
+                previous_run = db.get_resumable_scan_run(os.path.abspath(directory_path))
+                if previous_run:
+                    description_mode = previous_run['options'].get('mode', description_mode)
+                    st.info(f"Resuming previous scan after {previous_run['cursor'] or 'the start'}")
+                else:
+                    st.info("No interrupted scan found for this directory, starting a new one")
                 
             with st.spinner(f"Scanning directory using {description_mode} mode..."):
                 # Update CUTOFF_DATE in NetScanner
-                import NetScanner
                 NetScanner.CUTOFF_DATE = datetime.combine(cutoff_date, datetime.min.time())
                 
-                # Pass description_mode to process_file
-                def process_with_mode(file_path, directory):
-                    try:
-                        # Get basic file info first
-                        result = {
-                            'Filename': os.path.basename(file_path),
-                            'Path': file_path,
-                            'Contractor': 'unknown',
-                            'Project': 'unknown',
-                            'Description': '',
-                            'file_type': os.path.splitext(file_path)[1].lower()
-                        }
-                        
-                        # Get path-based info
-                        relative_path = os.path.relpath(file_path, directory)
-                        path_parts = relative_path.split(os.sep)
-                        if len(path_parts) >= 2:
-                            result['Contractor'] = path_parts[0]
-                        if len(path_parts) >= 3:
-                            result['Project'] = path_parts[1]
-                        
-                        # Generate description based on file type and selected mode
-                        if is_image_file(file_path):
-                            result['Description'] = generate_description(
-                                file_path, 
-                                mode=description_mode
-                            )
-                        elif is_design_file(file_path):
-                            result['Description'] = describe_design(file_path)
-                        elif is_pdf_file(file_path):
-                            result['Description'] = describe_pdf(file_path)
-                        else:
-                            result['Description'] = 'Unknown file type'
-                            
-                        return result
-                        
-                    except Exception as e:
-                        print(f"Error in process_with_mode: {str(e)}")
-                        return {
-                            'Filename': os.path.basename(file_path),
-                            'Path': file_path,
-                            'Contractor': 'unknown',
-                            'Project': 'unknown',
-                            'Description': f'Error processing file: {str(e)}',
-                            'file_type': os.path.splitext(file_path)[1].lower()
-                        }
+                # Run the scan
+                scan_stats = {}
+                results = scan_files_in_directory(
+                    directory_path,
+                    db,
+                    workers=describe_workers,
+                    incremental=incremental,
+                    use_hash=use_hash,
+                    stats=scan_stats,
+                    resume=resume,
+                    description_mode=description_mode
+                )
                 
-                # Temporarily replace process_file with our modified version
-                original_process = NetScanner.process_file
-                NetScanner.process_file = process_with_mode
+                st.success(f"Scan complete! Added {len(results)} new records to database.")
+                cache_lookups = scan_stats['cache_hits'] + scan_stats['cache_misses']
+                if cache_lookups:
+                    st.info(
+                        f"Description cache hit rate: "
+                        f"{scan_stats['cache_hits'] / cache_lookups:.0%} "
+                        f"({scan_stats['cache_hits']} of {cache_lookups} files)"
+                    )
+                if incremental:
+                    st.info(
+                        f"New: {scan_stats['files_new']}, "
+                        f"changed: {scan_stats['files_changed']}, "
+                        f"unchanged: {scan_stats['files_unchanged']}"
+                    )
+                if scan_stats['image_report']:
+                    st.info("Images sent to llava by file type:\n\n" +
+                            "\n".join(f"- {line}" for line in scan_stats['image_report']))
                 
-                try:
-                    # Run the scan
-                    results = scan_files_in_directory(directory_path, db)
-                    
-                    st.success(f"Scan complete! Added {len(results)} new records to database.")
-                    
-                    # Show preview of new data
-                    if results:
-                        st.subheader("Preview of Added Data")
-                        preview_df = pd.DataFrame(results)
-                        st.dataframe(
-                            preview_df[[
-                                'Filename',
-                                'Contractor',
-                                'Project',
-                                'Description',
-                                'file_type'
-                            ]],
-                            use_container_width=True
-                        )
-                finally:
-                    # Restore original process_file
-                    NetScanner.process_file = original_process
+                # Show preview of new data
+                if results:
+                    st.subheader("Preview of Added Data")
+                    preview_df = pd.DataFrame(results)
+                    st.dataframe(
+                        preview_df[[
+                            'Filename',
+                            'Contractor',
+                            'Project',
+                            'Description',
+                            'file_type'
+                        ]],
+                        use_container_width=True
+                    )
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,46 +1,178 @@
+#Load scan results into PostgreSQL with COPY. Rows are streamed from the CSV export or straight from
+#the SQLite scan_results table into a staging table, then upserted into `files` on the path.
+#To try it against a local container:
+#  docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres -e POSTGRES_DB=heirloom_db postgres:16
+#  PGHOST=localhost PGPASSWORD=postgres python csv_to_postgres.py ouput.csv
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import time
 import pandas as pd
 import psycopg2
-from psycopg2 import sql
+from dotenv import load_dotenv
 
-# Database connection parameters
+load_dotenv()
+
+# Database connection parameters, from the standard libpq environment variables
 db_params = {
-    'dbname': 'heirloom_db',
-    'user': 'postgres',
-    'password': '0xc097294c1c01fdcc',
-    'host': '192.168.1.177',
-    'port': '5432'
+    'dbname': os.getenv('PGDATABASE', 'heirloom_db'),
+    'user': os.getenv('PGUSER', 'postgres'),
+    'password': os.getenv('PGPASSWORD'),
+    'host': os.getenv('PGHOST', 'localhost'),
+    'port': os.getenv('PGPORT', '5432')
 }
 
-# Read the CSV file into a DataFrame
-csv_file_path = 'ouput.csv'
-df = pd.read_csv(csv_file_path)
-
-# Connect to the PostgreSQL database
-conn = psycopg2.connect(**db_params)
-cur = conn.cursor()
-
-# Create table if it doesn't exist
-create_table_query = """
-CREATE TABLE IF NOT EXISTS files (
-    Filename TEXT,
-    Path TEXT,
-    Contractor TEXT,
-    Project TEXT,
-    Description TEXT
-)
-"""
-cur.execute(create_table_query)
-conn.commit()
-
-# Insert DataFrame data into the PostgreSQL table
-for index, row in df.iterrows():
-    insert_query = sql.SQL("""
-    INSERT INTO files (Filename, Path, Contractor, Project, Description)
-    VALUES (%s, %s, %s, %s, %s)
+# Rows read from the source at a time
+CHUNK_ROWS = 50000
+
+# Bytes handed to COPY per read
+COPY_BUFFER_SIZE = 1024 * 1024
+
+COLUMNS = ['Filename', 'Path', 'Contractor', 'Project', 'Description']
+
+class RowStream:
+    """File-like object over an iterator of CSV text chunks, so COPY can stream them"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+        self._pos = 0
+
+    def read(self, size=-1):
+        # Pull chunks until the request can be served, keeping only the unread tail
+        while size < 0 or len(self._buffer) - self._pos < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._pos:] + chunk.encode('utf-8')
+            self._pos = 0
+        end = len(self._buffer) if size < 0 else self._pos + size
+        data = self._buffer[self._pos:end]
+        self._pos += len(data)
+        return data
+
+def csv_text(rows):
+    """Format rows as CSV text for COPY ... (FORMAT csv)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def chunks_from_csv(csv_file, chunk_size=CHUNK_ROWS, counter=None):
+    """Yield CSV text for the export's rows, `chunk_size` rows at a time"""
+    for chunk in pd.read_csv(csv_file, usecols=COLUMNS, chunksize=chunk_size, dtype=str):
+        # Missing values become NULL
+        rows = chunk[COLUMNS].astype(object).where(chunk[COLUMNS].notna(), None).itertuples(index=False)
+        if counter is not None:
+            counter['rows'] += len(chunk)
+        yield csv_text(rows)
+
+def chunks_from_sqlite(db_file='scanner_results.db', chunk_size=CHUNK_ROWS, counter=None):
+    """Yield CSV text for the rows of the scanner's scan_results table, `chunk_size` rows at a time"""
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.execute(
+            "SELECT filename, file_path, contractor, project, description FROM scan_results"
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if counter is not None:
+                counter['rows'] += len(rows)
+            yield csv_text(rows)
+    finally:
+        conn.close()
+
+def ensure_files_table(cur):
+    """Create the files table and the unique path index the upsert relies on"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            Filename TEXT,
+            Path TEXT,
+            Contractor TEXT,
+            Project TEXT,
+            Description TEXT
+        )
     """)
-    cur.execute(insert_query, tuple(row))
+    cur.execute("SELECT to_regclass('files_path_key')")
+    if cur.fetchone()[0] is None:
+        # Earlier versions inserted every row on every run; keep one copy per path
+        cur.execute("DELETE FROM files a USING files b WHERE a.Path = b.Path AND a.ctid < b.ctid")
+        cur.execute("CREATE UNIQUE INDEX files_path_key ON files (Path)")
+
+def load_chunks(conn, chunks):
+    """
+    COPY the rows into a staging table in one stream, then upsert them into
+    files on the path. Rows without a path are dropped; if a path appears
+    more than once the last row wins. Returns the number of rows upserted.
+    """
+    with conn.cursor() as cur:
+        ensure_files_table(cur)
+        cur.execute("""
+            CREATE TEMP TABLE files_staging (
+                Filename TEXT,
+                Path TEXT,
+                Contractor TEXT,
+                Project TEXT,
+                Description TEXT,
+                seq BIGSERIAL
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert(
+            "COPY files_staging (Filename, Path, Contractor, Project, Description) FROM STDIN WITH (FORMAT csv)",
+            RowStream(chunks),
+            size=COPY_BUFFER_SIZE
+        )
+        cur.execute("""
+            INSERT INTO files (Filename, Path, Contractor, Project, Description)
+            SELECT DISTINCT ON (Path) Filename, Path, Contractor, Project, Description
+            FROM files_staging
+            WHERE Path IS NOT NULL
+            ORDER BY Path, seq DESC
+            ON CONFLICT (Path) DO UPDATE SET
+                Filename = EXCLUDED.Filename,
+                Contractor = EXCLUDED.Contractor,
+                Project = EXCLUDED.Project,
+                Description = EXCLUDED.Description
+            WHERE (files.Filename, files.Contractor, files.Project, files.Description)
+                IS DISTINCT FROM (EXCLUDED.Filename, EXCLUDED.Contractor, EXCLUDED.Project, EXCLUDED.Description)
+        """)
+        upserted = cur.rowcount
+    conn.commit()
+    return upserted
+
+def load_to_postgres(csv_file=None, sqlite_file=None, chunk_size=CHUNK_ROWS):
+    """Load a CSV export, or the SQLite database if `sqlite_file` is given, into PostgreSQL"""
+    counter = {'rows': 0}
+    if sqlite_file:
+        chunks = chunks_from_sqlite(sqlite_file, chunk_size, counter)
+        source = sqlite_file
+    else:
+        chunks = chunks_from_csv(csv_file, chunk_size, counter)
+        source = csv_file
+
+    print(f"Loading {source} into {db_params['host']}/{db_params['dbname']}")
+    start_time = time.perf_counter()
+    conn = psycopg2.connect(**db_params)
+    try:
+        upserted = load_chunks(conn, chunks)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start_time
+    rate = counter['rows'] / elapsed if elapsed > 0 else 0
+    print(f"Read {counter['rows']} rows, inserted or updated {upserted} "
+          f"in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+    return upserted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load scan results into PostgreSQL")
+    parser.add_argument('csv_file', nargs='?', default='ouput.csv', help="CSV export to load")
+    parser.add_argument('--from-sqlite', metavar='DB_FILE',
+                        help="Load the scan_results table of this SQLite database instead of a CSV")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help="Rows read at a time")
+    args = parser.parse_args()
 
-# Commit the transaction and close the connection
-conn.commit()
-cur.close()
-conn.close()
\ No newline at end of file
+    load_to_postgres(args.csv_file, args.from_sqlite, args.chunk_size)
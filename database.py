@@ -1,15 +1,61 @@
+import json
+import re
 import sqlite3
+import threading
+import time
 from datetime import datetime
 import os
 
+# Default batch limits for add_scan_results
+BATCH_SIZE = 500
+BATCH_SECONDS = 2.0
+
 class Database:
     def __init__(self, db_file='scanner_results.db'):
         self.db_file = db_file
+        # One long-lived connection per thread; WAL lets them read while another writes
+        self._local = threading.local()
+        # Connection that only reads PRAGMA data_version, see data_version()
+        self._version_conn = None
+        self._version_lock = threading.Lock()
         self.init_db()
 
+    def connect(self):
+        """Return this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only syncs at checkpoints and is still safe from corruption
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # INSERT OR REPLACE only fires the delete trigger that keeps the search index in sync with this on
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    def data_version(self):
+        """
+        Return a number that changes whenever the database is committed to, for
+        keying caches of query results. PRAGMA data_version ignores commits made
+        by the connection that reads it, so it is read from a connection that is
+        never written through; every other connection, including this object's
+        per-thread ones and other processes, bumps it.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def init_db(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_file) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             # Create main results table with unique constraint on file_path
@@ -24,18 +70,196 @@ class Database:
                     file_type TEXT,
                     file_size INTEGER,
                     scan_date TIMESTAMP,
-                    last_modified TIMESTAMP
+                    last_modified TIMESTAMP,
+                    content_hash TEXT
+                )
+            ''')
+            
+            # Databases created before change detection lack the hash column
+            cursor.execute("PRAGMA table_info(scan_results)")
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'content_hash' not in columns:
+                cursor.execute("ALTER TABLE scan_results ADD COLUMN content_hash TEXT")
+            
+            # Journal of scan runs so an interrupted scan can be resumed
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scan_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    root TEXT NOT NULL,
+                    options TEXT,
+                    cursor TEXT,
+                    status TEXT NOT NULL,
+                    started_at TIMESTAMP,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            
+            # Descriptions of the individual pages of scanned PDFs. The search index
+            # refers to rows by id, so it needs a rowid that VACUUM keeps stable
+            cursor.execute("PRAGMA table_info(pdf_pages)")
+            page_columns = [row[1] for row in cursor.fetchall()]
+            if page_columns and 'id' not in page_columns:
+                cursor.execute("ALTER TABLE pdf_pages RENAME TO pdf_pages_old")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pdf_pages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_path TEXT NOT NULL,
+                    page_number INTEGER NOT NULL,
+                    description TEXT,
+                    UNIQUE (file_path, page_number)
+                )
+            ''')
+            if page_columns and 'id' not in page_columns:
+                cursor.execute('''
+                    INSERT INTO pdf_pages (file_path, page_number, description)
+                    SELECT file_path, page_number, description FROM pdf_pages_old
+                ''')
+                cursor.execute("DROP TABLE pdf_pages_old")
+            
+            # Full-text index over page descriptions, kept in sync by triggers
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'pdf_pages_fts'")
+            pages_fts_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS pdf_pages_fts USING fts5(
+                    description,
+                    content='pdf_pages', content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            ''')
+            cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_insert AFTER INSERT ON pdf_pages BEGIN
+                    INSERT INTO pdf_pages_fts (rowid, description) VALUES (new.id, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_delete AFTER DELETE ON pdf_pages BEGIN
+                    INSERT INTO pdf_pages_fts (pdf_pages_fts, rowid, description)
+                    VALUES ('delete', old.id, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_update AFTER UPDATE OF description ON pdf_pages BEGIN
+                    INSERT INTO pdf_pages_fts (pdf_pages_fts, rowid, description)
+                    VALUES ('delete', old.id, old.description);
+                    INSERT INTO pdf_pages_fts (rowid, description) VALUES (new.id, new.description);
+                END;
+            ''')
+            if not pages_fts_exists:
+                # Index pages written before the search index existed
+                cursor.execute("INSERT INTO pdf_pages_fts (pdf_pages_fts) VALUES ('rebuild')")
+            
+            # Full-text index over filenames and descriptions, kept in sync by triggers
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'scan_results_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS scan_results_fts USING fts5(
+                    filename, description,
+                    content='scan_results', content_rowid='id',
+                    tokenize='porter unicode61'
                 )
             ''')
+            cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS scan_results_fts_insert AFTER INSERT ON scan_results BEGIN
+                    INSERT INTO scan_results_fts (rowid, filename, description)
+                    VALUES (new.id, new.filename, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS scan_results_fts_delete AFTER DELETE ON scan_results BEGIN
+                    INSERT INTO scan_results_fts (scan_results_fts, rowid, filename, description)
+                    VALUES ('delete', old.id, old.filename, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS scan_results_fts_update AFTER UPDATE OF filename, description ON scan_results BEGIN
+                    INSERT INTO scan_results_fts (scan_results_fts, rowid, filename, description)
+                    VALUES ('delete', old.id, old.filename, old.description);
+                    INSERT INTO scan_results_fts (rowid, filename, description)
+                    VALUES (new.id, new.filename, new.description);
+                END;
+            ''')
+            if not fts_exists:
+                # Index rows written before the search index existed
+                cursor.execute("INSERT INTO scan_results_fts (scan_results_fts) VALUES ('rebuild')")
+            
+            # Row count and total size per file type, contractor and project, kept up to
+            # date by triggers so dashboards never have to aggregate scan_results
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'scan_summary'")
+            summary_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scan_summary (
+                    file_type TEXT NOT NULL,
+                    contractor TEXT NOT NULL,
+                    project TEXT NOT NULL,
+                    file_count INTEGER NOT NULL,
+                    total_size INTEGER NOT NULL,
+                    PRIMARY KEY (file_type, contractor, project)
+                )
+            ''')
+            cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS scan_summary_insert AFTER INSERT ON scan_results BEGIN
+                    INSERT INTO scan_summary (file_type, contractor, project, file_count, total_size)
+                    VALUES (IFNULL(new.file_type, ''), IFNULL(new.contractor, ''), IFNULL(new.project, ''),
+                            1, IFNULL(new.file_size, 0))
+                    ON CONFLICT (file_type, contractor, project) DO UPDATE SET
+                        file_count = file_count + 1,
+                        total_size = total_size + excluded.total_size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS scan_summary_delete AFTER DELETE ON scan_results BEGIN
+                    UPDATE scan_summary SET
+                        file_count = file_count - 1,
+                        total_size = total_size - IFNULL(old.file_size, 0)
+                    WHERE file_type = IFNULL(old.file_type, '') AND contractor = IFNULL(old.contractor, '')
+                      AND project = IFNULL(old.project, '');
+                    DELETE FROM scan_summary WHERE file_count <= 0;
+                END;
+                CREATE TRIGGER IF NOT EXISTS scan_summary_update
+                AFTER UPDATE OF file_type, contractor, project, file_size ON scan_results BEGIN
+                    UPDATE scan_summary SET
+                        file_count = file_count - 1,
+                        total_size = total_size - IFNULL(old.file_size, 0)
+                    WHERE file_type = IFNULL(old.file_type, '') AND contractor = IFNULL(old.contractor, '')
+                      AND project = IFNULL(old.project, '');
+                    DELETE FROM scan_summary WHERE file_count <= 0;
+                    INSERT INTO scan_summary (file_type, contractor, project, file_count, total_size)
+                    VALUES (IFNULL(new.file_type, ''), IFNULL(new.contractor, ''), IFNULL(new.project, ''),
+                            1, IFNULL(new.file_size, 0))
+                    ON CONFLICT (file_type, contractor, project) DO UPDATE SET
+                        file_count = file_count + 1,
+                        total_size = total_size + excluded.total_size;
+                END;
+            ''')
+            if not summary_exists:
+                # Roll up rows written before the summary existed
+                cursor.execute('''
+                    INSERT INTO scan_summary (file_type, contractor, project, file_count, total_size)
+                    SELECT IFNULL(file_type, ''), IFNULL(contractor, ''), IFNULL(project, ''),
+                           COUNT(*), IFNULL(SUM(file_size), 0)
+                    FROM scan_results GROUP BY 1, 2, 3
+                ''')
+            
+            # Members of duplicate groups found by duplicate_finder; a group is every
+            # path with the same content hash
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS duplicate_files (
+                    file_path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    found_date TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_duplicate_files_hash
+                ON duplicate_files (content_hash)
+            ''')
+            
+            # Case-insensitive path lookups use this index instead of scanning
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_scan_results_path_nocase
+                ON scan_results (file_path COLLATE NOCASE)
+            ''')
             
             conn.commit()
 
-    def add_scan_result(self, result):
-        """Add or update a scan result"""
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.cursor()
-            
-            # Get file stats
+    def _scan_result_row(self, result):
+        """Build the scan_results row for a scanner result dict"""
+        # Get file stats, reusing the scanner's stat data when it was passed in
+        if '_file_stats' in result:
+            file_size = result['_file_stats']['size']
+            last_modified = datetime.fromtimestamp(result['_file_stats']['mtime'])
+        else:
             try:
                 file_stats = os.stat(result['Path'])
                 file_size = file_stats.st_size
@@ -43,97 +267,401 @@ class Database:
             except (FileNotFoundError, OSError):
                 file_size = 0
                 last_modified = datetime.now()
-            
-            # Get file type
-            file_type = os.path.splitext(result['Filename'])[1].lower()
-            
+        
+        # Get file type
+        file_type = os.path.splitext(result['Filename'])[1].lower()
+        
+        return (
+            result['Filename'],
+            result['Path'],
+            result.get('Contractor', 'Unknown'),
+            result.get('Project', 'Unknown'),
+            result.get('Description', ''),
+            file_type,
+            file_size,
+            datetime.now(),
+            last_modified,
+            result.get('content_hash')
+        )
+
+    # Use INSERT OR REPLACE to handle duplicates
+    INSERT_SQL = '''
+        INSERT OR REPLACE INTO scan_results 
+        (filename, file_path, contractor, project, description, 
+         file_type, file_size, scan_date, last_modified, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    def _write_pages(self, conn, result):
+        """
+        Replace the stored page descriptions of a result. A file described
+        without pages, such as a PDF that now has text, keeps none.
+        """
+        conn.execute("DELETE FROM pdf_pages WHERE file_path = ?", (result['Path'],))
+        if 'Pages' not in result:
+            return
+        conn.executemany(
+            "INSERT INTO pdf_pages (file_path, page_number, description) VALUES (?, ?, ?)",
+            [(result['Path'], page_number, description) for page_number, description in result['Pages']]
+        )
+
+    def add_scan_result(self, result):
+        """Add or update a scan result"""
+        with self.connect() as conn:
             try:
-                # Use INSERT OR REPLACE to handle duplicates
-                cursor.execute('''
-                    INSERT OR REPLACE INTO scan_results 
-                    (filename, file_path, contractor, project, description, 
-                     file_type, file_size, scan_date, last_modified)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    result['Filename'],
-                    result['Path'],
-                    result.get('Contractor', 'Unknown'),
-                    result.get('Project', 'Unknown'),
-                    result.get('Description', ''),
-                    file_type,
-                    file_size,
-                    datetime.now(),
-                    last_modified
-                ))
-                
-                conn.commit()
+                conn.execute(self.INSERT_SQL, self._scan_result_row(result))
+                self._write_pages(conn, result)
             except Exception as e:
                 print(f"Error inserting record for {result['Path']}: {str(e)}")
                 raise
 
+    def import_scan_results(self, results):
+        """
+        Add or update a block of scan results with one executemany in a single
+        transaction, for bulk imports. Raises if any row fails, leaving none of
+        the block written. Returns the number of rows written.
+        """
+        rows = [self._scan_result_row(result) for result in results]
+        with self.connect() as conn:
+            conn.executemany(self.INSERT_SQL, rows)
+        return len(rows)
+
+    def add_scan_results(self, results, batch_size=BATCH_SIZE, batch_seconds=BATCH_SECONDS,
+                         on_written=None):
+        """
+        Add or update many scan results, committing every `batch_size` rows or
+        `batch_seconds` seconds, whichever comes first. `results` may be any
+        iterable, including a generator that is still producing rows; such a
+        generator yields None before it blocks, and the rows written so far are
+        committed then, so the write lock is never held while waiting.
+        `on_written` is called with each result once its row has been written.
+        Returns the number of rows written.
+        """
+        conn = self.connect()
+        written = 0
+        pending = 0
+        last_commit = time.monotonic()
+        try:
+            for result in results:
+                if result is None:
+                    # The producer is about to wait; let other connections write meanwhile
+                    if pending:
+                        conn.commit()
+                        pending = 0
+                        last_commit = time.monotonic()
+                    continue
+                
+                try:
+                    conn.execute(self.INSERT_SQL, self._scan_result_row(result))
+                    self._write_pages(conn, result)
+                except sqlite3.Error as e:
+                    print(f"Error inserting record for {result['Path']}: {str(e)}")
+                    continue
+                
+                written += 1
+                pending += 1
+                if on_written is not None:
+                    on_written(result)
+                
+                if pending >= batch_size or time.monotonic() - last_commit >= batch_seconds:
+                    conn.commit()
+                    pending = 0
+                    last_commit = time.monotonic()
+        finally:
+            # Keep whatever was written, even if the producer failed part way
+            conn.commit()
+        return written
+
+    @staticmethod
+    def fts_query(term):
+        """
+        Turn free text into an FTS5 query that matches every word, as a prefix.
+        Quoting each word keeps characters like '-' or '"' from being read as syntax.
+        """
+        words = re.findall(r'\w+', term or '')
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def _results_query(self, filters=None):
+        """Build the query and parameters for get_results and iter_results"""
+        query = "SELECT * FROM scan_results"
+        params = []
+        search = self.fts_query(filters.get('search')) if filters else ''
+        if search:
+            # Filename matches weigh more than matches in the description
+            query = '''
+                SELECT scan_results.*,
+                       bm25(scan_results_fts, 5.0, 1.0) AS rank,
+                       snippet(scan_results_fts, 1, '«', '»', '…', 16) AS snippet
+                FROM scan_results_fts
+                JOIN scan_results ON scan_results.id = scan_results_fts.rowid
+            '''
+        
+        if filters:
+            conditions = []
+            if search:
+                conditions.append("scan_results_fts MATCH ?")
+                params.append(search)
+            if 'file_path' in filters:
+                # Use exact path matching
+                conditions.append("file_path = ? COLLATE NOCASE")
+                params.append(filters['file_path'])
+            if 'ids' in filters:
+                conditions.append("scan_results.id IN (" + ",".join("?" * len(filters['ids'])) + ")")
+                params.extend(filters['ids'])
+            if 'contractors' in filters and filters['contractors']:
+                conditions.append("contractor IN (" + ",".join("?" * len(filters['contractors'])) + ")")
+                params.extend(filters['contractors'])
+            if 'projects' in filters and filters['projects']:
+                conditions.append("project IN (" + ",".join("?" * len(filters['projects'])) + ")")
+                params.extend(filters['projects'])
+            if 'file_types' in filters and filters['file_types']:
+                conditions.append("file_type IN (" + ",".join("?" * len(filters['file_types'])) + ")")
+                params.extend(filters['file_types'])
+            
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+        
+        if search:
+            query += " ORDER BY rank"
+        
+        return query, params
+
     def get_results(self, filters=None):
-        """Get scan results with optional filtering"""
-        with sqlite3.connect(self.db_file) as conn:
-            conn.row_factory = sqlite3.Row
+        """
+        Get scan results with optional filtering. A 'search' filter matches
+        words in filenames and descriptions through the full-text index; the
+        results are then ordered best match first and carry a 'rank' (bm25,
+        lower is better) and a 'snippet' with the matches marked by « ».
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(*self._results_query(filters))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def iter_results(self, filters=None, batch_size=BATCH_SIZE):
+        """Yield the rows get_results would return, `batch_size` rows at a time from the database"""
+        cursor = self.connect().cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(*self._results_query(filters))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+
+    def get_pdf_pages(self, file_path):
+        """Return the (page_number, description) pairs stored for a scanned PDF"""
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT page_number, description FROM pdf_pages
+                WHERE file_path = ? COLLATE NOCASE ORDER BY page_number
+            ''', (file_path,))
+            return cursor.fetchall()
+
+    def search_pdf_pages(self, term):
+        """Return pages of scanned PDFs whose description matches every word of a term, best first"""
+        query = self.fts_query(term)
+        if not query:
+            return []
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute('''
+                SELECT pdf_pages.file_path, pdf_pages.page_number, pdf_pages.description
+                FROM pdf_pages_fts
+                JOIN pdf_pages ON pdf_pages.id = pdf_pages_fts.rowid
+                WHERE pdf_pages_fts MATCH ?
+                ORDER BY bm25(pdf_pages_fts), pdf_pages.file_path, pdf_pages.page_number
+            ''', (query,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_known_files(self):
+        """
+        Load every stored path with its size, modification time and content hash
+        in one query. Keys are lowercased to match the case-insensitive 'file_path' filter.
+        """
+        with self.connect() as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT file_path, file_size, last_modified, content_hash FROM scan_results")
+            return {row[0].lower(): {'file_size': row[1],
+                                     'last_modified': row[2],
+                                     'content_hash': row[3]}
+                    for row in cursor}
+
+    def touch_scan_result(self, file_path, file_size, last_modified):
+        """Record new file stats for a result whose content did not change"""
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE scan_results SET file_size = ?, last_modified = ?
+                WHERE file_path = ? COLLATE NOCASE
+            ''', (file_size, last_modified, file_path))
+            conn.commit()
+
+    def start_scan_run(self, root, options):
+        """Record the start of a scan and return its run id"""
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO scan_runs (root, options, status, started_at, updated_at)
+                VALUES (?, ?, 'running', ?, ?)
+            ''', (root, json.dumps(options), datetime.now(), datetime.now()))
+            return cursor.lastrowid
+
+    def get_resumable_scan_run(self, root):
+        """Return the latest unfinished scan run for a root, or None"""
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute('''
+                SELECT * FROM scan_runs
+                WHERE root = ? AND status = 'running'
+                ORDER BY id DESC LIMIT 1
+            ''', (root,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            run = dict(row)
+            run['options'] = json.loads(run['options'] or '{}')
+            return run
+
+    def set_scan_run_cursor(self, run_id, cursor):
+        """
+        Move a scan run's cursor to the last file written. This is not committed
+        on its own, so it becomes durable together with the rows it covers.
+        """
+        self.connect().execute(
+            "UPDATE scan_runs SET cursor = ?, updated_at = ? WHERE id = ?",
+            (cursor, datetime.now(), run_id)
+        )
+
+    def finish_scan_run(self, run_id):
+        """Mark a scan run as completed so it is no longer resumed"""
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE scan_runs SET status = 'completed', updated_at = ? WHERE id = ?",
+                (datetime.now(), run_id)
+            )
+
+    def record_duplicate_groups(self, groups, root):
+        """
+        Store the duplicate groups found below `root`, replacing the groups
+        recorded for it before. `groups` is the list find_duplicates returns.
+        """
+        prefix = os.path.join(os.path.abspath(root), '')
+        found_date = datetime.now()
+        with self.connect() as conn:
+            # Paths below root sort between the prefix and the prefix with its last character bumped
+            conn.execute(
+                "DELETE FROM duplicate_files WHERE file_path >= ? AND file_path < ?",
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO duplicate_files (file_path, content_hash, file_size, found_date) "
+                "VALUES (?, ?, ?, ?)",
+                [(path, group['content_hash'], group['size'], found_date)
+                 for group in groups for path in group['paths']]
+            )
+            conn.commit()
+
+    def get_duplicate_files(self):
+        """Map every recorded duplicate's lowercased path to its content hash and size"""
+        with self.connect() as conn:
+            cursor = conn.execute("SELECT file_path, content_hash, file_size FROM duplicate_files")
+            return {row[0].lower(): {'content_hash': row[1], 'file_size': row[2]} for row in cursor}
+
+    def remove_duplicate_file(self, file_path):
+        """Drop a file from its duplicate group, e.g. once its content has changed"""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM duplicate_files WHERE file_path = ? COLLATE NOCASE", (file_path,))
+            conn.commit()
+
+    def get_duplicate_descriptions(self):
+        """
+        Map content hashes of duplicate groups to a description already stored
+        for one of their files, so the other copies need not be described again.
+        """
+        with self.connect() as conn:
+            cursor = conn.execute("""
+                SELECT d.content_hash, r.description
+                FROM duplicate_files d
+                JOIN scan_results r ON r.file_path = d.file_path COLLATE NOCASE
+                WHERE r.description != '' AND r.description NOT LIKE 'Error processing file%'
+            """)
+            return {row[0]: row[1] for row in cursor}
+
+    def get_duplicate_groups(self):
+        """Recorded duplicate groups, largest reclaimable space first"""
+        with self.connect() as conn:
+            cursor = conn.execute("""
+                SELECT content_hash, file_size, GROUP_CONCAT(file_path, char(10))
+                FROM duplicate_files
+                GROUP BY content_hash, file_size
+                ORDER BY file_size * (COUNT(*) - 1) DESC
+            """)
+            return [{'content_hash': row[0], 'size': row[1], 'paths': sorted(row[2].split('\n'))}
+                    for row in cursor]
+
+    def get_summary(self, filters=None):
+        """
+        Return the scan_summary groups (file_type, contractor, project,
+        file_count, total_size), optionally limited to the 'contractors',
+        'projects' and 'file_types' in filters. Reads one row per group,
+        however many files there are.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
-            query = "SELECT * FROM scan_results"
+            query = "SELECT * FROM scan_summary"
+            conditions = []
             params = []
-            
-            if filters:
-                conditions = []
-                if 'file_path' in filters:
-                    # Use exact path matching
-                    conditions.append("LOWER(file_path) = LOWER(?)")
-                    params.append(filters['file_path'])
-                if 'contractors' in filters and filters['contractors']:
-                    conditions.append("contractor IN (" + ",".join("?" * len(filters['contractors'])) + ")")
-                    params.extend(filters['contractors'])
-                if 'projects' in filters and filters['projects']:
-                    conditions.append("project IN (" + ",".join("?" * len(filters['projects'])) + ")")
-                    params.extend(filters['projects'])
-                if 'file_types' in filters and filters['file_types']:
-                    conditions.append("file_type IN (" + ",".join("?" * len(filters['file_types'])) + ")")
-                    params.extend(filters['file_types'])
-                
-                if conditions:
-                    query += " WHERE " + " AND ".join(conditions)
+            for key, column in (('contractors', 'contractor'), ('projects', 'project'), ('file_types', 'file_type')):
+                if filters and filters.get(key):
+                    conditions.append(f"{column} IN (" + ",".join("?" * len(filters[key])) + ")")
+                    params.extend(filters[key])
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
             
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
 
     def get_statistics(self):
-        """Get scanning statistics"""
-        with sqlite3.connect(self.db_file) as conn:
+        """Get scanning statistics from the summary table"""
+        with self.connect() as conn:
             cursor = conn.cursor()
             
             stats = {}
             
             # Total files
-            cursor.execute("SELECT COUNT(*) FROM scan_results")
+            cursor.execute("SELECT IFNULL(SUM(file_count), 0) FROM scan_summary")
             stats['total_files'] = cursor.fetchone()[0]
             
             # Files by type
             cursor.execute("""
-                SELECT file_type, COUNT(*) as count, SUM(file_size) as total_size 
-                FROM scan_results 
+                SELECT file_type, SUM(file_count) as count, SUM(total_size) as total_size 
+                FROM scan_summary 
                 GROUP BY file_type
             """)
             stats['file_types'] = {row[0]: {'count': row[1], 'size': row[2]} 
                                  for row in cursor.fetchall()}
             
             # Contractors and projects
-            cursor.execute("SELECT DISTINCT contractor FROM scan_results")
+            cursor.execute("SELECT DISTINCT contractor FROM scan_summary")
             stats['contractors'] = [row[0] for row in cursor.fetchall()]
             
-            cursor.execute("SELECT DISTINCT project FROM scan_results")
+            cursor.execute("SELECT DISTINCT project FROM scan_summary")
             stats['projects'] = [row[0] for row in cursor.fetchall()]
             
             return stats 
 
     def clear_database(self):
         """Clear all records from the database"""
-        with sqlite3.connect(self.db_file) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM scan_results')
+            cursor.execute('DELETE FROM pdf_pages')
             conn.commit() 
\ No newline at end of file
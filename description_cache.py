@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from file_hasher import hash_file
+
+# Upper bound on the stored description text before least recently used entries are evicted
+CACHE_MAX_BYTES = int(os.getenv('DESCRIPTION_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+# How long a cache write waits for the scan's batch writer to release the database, in milliseconds
+CACHE_BUSY_TIMEOUT_MS = int(os.getenv('DESCRIPTION_CACHE_BUSY_MS', '30000'))
+
+class DescriptionCache:
+    """
+    Descriptions keyed by file content, model, description mode and prompt,
+    so copies of the same file in different folders are only described once.
+    """
+    def __init__(self, db_file='scanner_results.db', max_bytes=CACHE_MAX_BYTES):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # One long-lived connection per describe worker, like Database.connect()
+        self._local = threading.local()
+        self.init_db()
+
+    def connect(self):
+        """Return this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=CACHE_BUSY_TIMEOUT_MS / 1000)
+            conn.execute(f"PRAGMA busy_timeout={CACHE_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_db(self):
+        """Create the cache table if needed"""
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS description_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_description_cache_last_used
+                ON description_cache (last_used)
+            ''')
+            conn.commit()
+            
+            cursor.execute("SELECT COALESCE(SUM(size), 0) FROM description_cache")
+            self._total_bytes = cursor.fetchone()[0]
+
+    def make_key(self, file_path, model, mode, prompt):
+        """Build the cache key from the file's content digest and the request settings"""
+        key = hashlib.sha256()
+        for part in (hash_file(file_path), model, mode, prompt):
+            key.update(part.encode('utf-8'))
+            key.update(b'\0')
+        return key.hexdigest()
+
+    def get(self, cache_key, count=True):
+        """
+        Return the cached description for a key, or None. Lookups of entries
+        stored alongside a description pass count=False so they do not skew
+        the hit rate.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT description FROM description_cache WHERE cache_key = ?",
+                           (cache_key,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("UPDATE description_cache SET last_used = ? WHERE cache_key = ?",
+                               (time.time(), cache_key))
+                conn.commit()
+
+        if count:
+            with self._lock:
+                if row:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return row[0] if row else None
+
+    def put(self, cache_key, description):
+        """Store a description and evict old entries if the cache is over its size limit"""
+        size = len(description.encode('utf-8'))
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO description_cache (cache_key, description, size, last_used)
+                VALUES (?, ?, ?, ?)
+            ''', (cache_key, description, size, time.time()))
+
+            conn.commit()
+
+            with self._lock:
+                self._total_bytes += size
+                if self._total_bytes <= self.max_bytes:
+                    return
+
+                # Drop least recently used entries until the total fits again
+                cursor.execute("SELECT COALESCE(SUM(size), 0) FROM description_cache")
+                total = cursor.fetchone()[0]
+                evict = []
+                cursor.execute("SELECT cache_key, size FROM description_cache ORDER BY last_used")
+                for key, entry_size in cursor:
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((key,))
+                    total -= entry_size
+                cursor.executemany("DELETE FROM description_cache WHERE cache_key = ?", evict)
+                conn.commit()
+                self._total_bytes = total
+
+    def reset_stats(self):
+        """Reset the hit and miss counters"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the shared cache stored next to the scan results"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DescriptionCache()
+        return _default_cache
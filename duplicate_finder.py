@@ -0,0 +1,134 @@
+#Find duplicate files. Files are grouped by size, then by a hash of their first and last blocks,
+#and only files that still match after that are read in full
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from file_hasher import hash_file
+from file_walker import walk_files
+
+# Bytes hashed from each end of a file before deciding whether to read all of it
+PARTIAL_BYTES = int(os.getenv('DUPLICATE_PARTIAL_KB', '16')) * 1024
+
+# Smaller files are ignored; identical tiny files free almost nothing
+MIN_DUPLICATE_SIZE = int(os.getenv('DUPLICATE_MIN_BYTES', '1024'))
+
+# Files read at the same time; hashing a share waits on the file server more than the CPU
+HASH_WORKERS = int(os.getenv('DUPLICATE_HASH_WORKERS', '8'))
+
+def partial_hash(file_path, size, partial_bytes=PARTIAL_BYTES):
+    """
+    Hash the first and last `partial_bytes` of a file. A file no longer than
+    both ends together is hashed whole, with the same digest hash_file gives,
+    so it never needs the full-hash pass.
+    """
+    if size <= 2 * partial_bytes:
+        return hash_file(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(partial_bytes))
+        f.seek(-partial_bytes, os.SEEK_END)
+        digest.update(f.read(partial_bytes))
+    return digest.hexdigest()
+
+def full_hash(file_path, size):
+    """sha256 of the whole file, read in chunks; the digest stored as content_hash"""
+    return hash_file(file_path)
+
+def split_groups(groups, hasher, workers=HASH_WORKERS):
+    """
+    Split groups of same-sized paths by hasher(path, size), hashing on a
+    thread pool. Files that cannot be read are dropped, and so are groups
+    left with a single file. Returns {(size, digest): [paths]}.
+    """
+    jobs = [(path, size) for size, paths in groups for path in paths]
+
+    def run(job):
+        try:
+            return hasher(*job)
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        digests = list(executor.map(run, jobs))
+
+    split = defaultdict(list)
+    for (path, size), digest in zip(jobs, digests):
+        if digest is not None:
+            split[(size, digest)].append(path)
+    return {key: paths for key, paths in split.items() if len(paths) > 1}
+
+def find_duplicates(files, workers=HASH_WORKERS, min_size=MIN_DUPLICATE_SIZE, stats=None):
+    """
+    Find groups of identical files among `files`, an iterable of (path, size).
+
+    1. Files are grouped by size; a file with a unique size has no duplicate.
+    2. Files sharing a size are grouped by partial_hash.
+    3. Files still sharing a partial hash are read in full with full_hash.
+
+    Returns a list of {'content_hash', 'size', 'paths'} dicts, largest
+    reclaimable space first. Pass a dict as `stats` to receive how many files
+    reached each stage.
+    """
+    by_size = defaultdict(list)
+    total_files = 0
+    for path, size in files:
+        total_files += 1
+        if size >= min_size:
+            by_size[size].append(path)
+    size_groups = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+
+    partial_groups = split_groups(size_groups, partial_hash, workers)
+
+    # Small files were hashed whole in the partial pass already
+    done = {key: paths for key, paths in partial_groups.items() if key[0] <= 2 * PARTIAL_BYTES}
+    to_read = [(size, paths) for (size, _), paths in partial_groups.items() if size > 2 * PARTIAL_BYTES]
+    full_groups = {**done, **split_groups(to_read, full_hash, workers)}
+
+    if stats is not None:
+        stats.update({
+            'files': total_files,
+            'same_size': sum(len(paths) for _, paths in size_groups),
+            'partial_hashed': sum(len(paths) for paths in partial_groups.values()),
+            'fully_read': sum(len(paths) for _, paths in to_read),
+            'groups': len(full_groups)
+        })
+
+    groups = [{'content_hash': digest, 'size': size, 'paths': sorted(paths)}
+              for (size, digest), paths in full_groups.items()]
+    groups.sort(key=lambda group: group['size'] * (len(group['paths']) - 1), reverse=True)
+    return groups
+
+def find_duplicates_in(directory_path, workers=HASH_WORKERS, min_size=MIN_DUPLICATE_SIZE, stats=None):
+    """Walk a directory and find duplicate files below it"""
+    files = ((entry.path, entry.size) for entry in walk_files(directory_path))
+    return find_duplicates(files, workers=workers, min_size=min_size, stats=stats)
+
+def reclaimable_space(groups, categorize=None):
+    """
+    Bytes freed per category by keeping one copy of each group. `categorize`
+    maps a path to a category; by default the lowercased file extension.
+    """
+    if categorize is None:
+        categorize = lambda path: os.path.splitext(path)[1].lower() or 'no extension'
+    totals = defaultdict(int)
+    for group in groups:
+        totals[categorize(group['paths'][0])] += group['size'] * (len(group['paths']) - 1)
+    return dict(totals)
+
+if __name__ == "__main__":
+    from database import Database
+
+    directory = input("Enter directory path to search for duplicates: ")
+    if os.path.exists(directory):
+        directory = os.path.abspath(directory)
+        stats = {}
+        groups = find_duplicates_in(directory, stats=stats)
+        Database().record_duplicate_groups(groups, directory)
+
+        print(f"\n{stats['files']} files, {stats['same_size']} share a size, "
+              f"{stats['fully_read']} read in full, {stats['groups']} duplicate groups")
+        for category, size in sorted(reclaimable_space(groups).items(), key=lambda item: item[1], reverse=True):
+            print(f"{category}: {size / (1024 ** 3):.2f} GB reclaimable")
+    else:
+        print("Invalid directory path!")
@@ -0,0 +1,260 @@
+#Semantic search over descriptions. Each description is embedded with a local Ollama model and
+#stored as one row of a float16 matrix on disk, which is memory-mapped and scanned with NumPy
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import ollama
+
+# Local embedding model served by Ollama
+EMBED_MODEL = os.getenv('EMBED_MODEL', 'nomic-embed-text')
+
+# Vectors are cut to this many dimensions and renormalised. nomic-embed-text is trained so
+# its leading dimensions work on their own, and 256 keeps a 1M row matrix at 512 MB
+EMBED_DIMENSIONS = int(os.getenv('EMBED_DIMENSIONS', '256'))
+
+# nomic-embed-text expects these task prefixes; set both to '' for models that do not
+DOCUMENT_PREFIX = os.getenv('EMBED_DOCUMENT_PREFIX', 'search_document: ')
+QUERY_PREFIX = os.getenv('EMBED_QUERY_PREFIX', 'search_query: ')
+
+# Descriptions sent to Ollama per embed request
+EMBED_BATCH_SIZE = 64
+
+# Rows scored per block; blocks are scored on several threads, NumPy releases the GIL
+SEARCH_BLOCK_ROWS = 65536
+SEARCH_THREADS = os.cpu_count() or 1
+
+# Casting float16 rows to float32 is most of the cost of a search, so a float32 copy of the
+# matrix is kept in memory while it fits in this many MB (1M rows at 256 dimensions take 1 GB)
+SEARCH_CACHE_MB = int(os.getenv('EMBED_SEARCH_CACHE_MB', '1024'))
+
+def normalize(vectors, dimensions=EMBED_DIMENSIONS):
+    """Cut vectors to `dimensions` and scale them to unit length, so a dot product is the cosine"""
+    vectors = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def embed(texts, model=EMBED_MODEL, dimensions=EMBED_DIMENSIONS):
+    """Return unit vectors for a list of texts"""
+    response = ollama.embed(model=model, input=texts)
+    return normalize(response['embeddings'], dimensions)
+
+class EmbeddingIndex:
+    """
+    Embeddings for scan_results, kept in three files next to the database:
+      <prefix>.f16   float16 matrix, one row per embedded description
+      <prefix>.ids   int64 scan_results id for each row, negated once the row is dead
+      <prefix>.json  model and dimensions the matrix was built with
+    Both data files are only appended to, so updates are incremental. Rows are
+    never moved; a result that is rewritten (INSERT OR REPLACE gives it a new
+    id) gets a new row and its old row is marked dead.
+    """
+
+    def __init__(self, prefix='scanner_embeddings', model=EMBED_MODEL, dimensions=EMBED_DIMENSIONS):
+        self.matrix_file = prefix + '.f16'
+        self.ids_file = prefix + '.ids'
+        self.meta_file = prefix + '.json'
+        self.model = model
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._ids = None
+        # (float32 buffer, rows filled) copy of the matrix, see _float32_rows
+        self._resident = None
+        self._resident_lock = threading.Lock()
+        # (Database, data_version) the index was last brought up to date with
+        self._synced = None
+        self._check_meta()
+        self._load()
+
+    def _check_meta(self):
+        """Start again if the files were built with another model or size"""
+        meta = {'model': self.model, 'dimensions': self.dimensions}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                if json.load(f) == meta:
+                    return
+        for path in (self.matrix_file, self.ids_file):
+            if os.path.exists(path):
+                os.remove(path)
+        with open(self.meta_file, 'w') as f:
+            json.dump(meta, f)
+
+    def _load(self):
+        """Memory-map the matrix and ids, dropping a partly written last row"""
+        row_bytes = self.dimensions * 2
+        matrix_rows = os.path.getsize(self.matrix_file) // row_bytes if os.path.exists(self.matrix_file) else 0
+        id_rows = os.path.getsize(self.ids_file) // 8 if os.path.exists(self.ids_file) else 0
+        rows = min(matrix_rows, id_rows)
+        for path, size in ((self.matrix_file, rows * row_bytes), (self.ids_file, rows * 8)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+        if rows:
+            self._matrix = np.memmap(self.matrix_file, dtype=np.float16, mode='r',
+                                     shape=(rows, self.dimensions))
+            self._ids = np.memmap(self.ids_file, dtype=np.int64, mode='r+', shape=(rows,))
+        else:
+            self._matrix = np.empty((0, self.dimensions), dtype=np.float16)
+            self._ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._ids > 0))
+
+    def last_id(self):
+        """Highest scan_results id embedded so far, including dead rows"""
+        return int(np.abs(self._ids).max()) if len(self._ids) else 0
+
+    def _reset(self):
+        """Drop every row"""
+        self._matrix = self._ids = None
+        with self._resident_lock:
+            self._resident = None
+        for path in (self.matrix_file, self.ids_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._load()
+
+    def _append(self, ids, vectors):
+        """Append rows to both files and map them in"""
+        # The matrix goes first so a crash in between leaves a row _load can drop
+        with open(self.matrix_file, 'ab') as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        with open(self.ids_file, 'ab') as f:
+            f.write(np.asarray(ids, dtype=np.int64).tobytes())
+        self._load()
+
+    def update(self, db, progress=None):
+        """
+        Embed rows added since the last update and mark rows whose result is
+        gone as dead. scan_results ids only grow, so new rows are found with
+        one range query. Nothing is read if the database has not been written
+        to since the last update, so calling this before every search is cheap.
+        Returns the number of rows embedded.
+        """
+        with self._lock:
+            version = db.data_version()
+            if self._synced == (db, version):
+                return 0
+            conn = db.connect()
+            
+            # A recreated database starts its ids again, so nothing here applies to it
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'scan_results'").fetchone()
+            if len(self._ids) and (row[0] if row else 0) < self.last_id():
+                self._reset()
+            
+            # Every result up to last_id has a live row, so fewer results than live rows
+            # means some were deleted or replaced; only then are all the ids compared
+            last_id = self.last_id()
+            existing = conn.execute("SELECT COUNT(*) FROM scan_results WHERE id <= ?", (last_id,)).fetchone()[0]
+            if existing != len(self):
+                live_ids = np.fromiter((row[0] for row in conn.execute("SELECT id FROM scan_results")),
+                                       dtype=np.int64)
+                dead = (self._ids > 0) & ~np.isin(self._ids, live_ids)
+                if dead.any():
+                    self._ids[dead] = -self._ids[dead]
+                    self._ids.flush()
+            
+            cursor = conn.execute(
+                "SELECT id, filename, description FROM scan_results WHERE id > ? ORDER BY id",
+                (last_id,)
+            )
+            added = 0
+            while True:
+                rows = cursor.fetchmany(EMBED_BATCH_SIZE)
+                if not rows:
+                    break
+                texts = [f"{DOCUMENT_PREFIX}{filename}: {description or ''}" for _, filename, description in rows]
+                self._append([row[0] for row in rows], embed(texts, self.model, self.dimensions))
+                added += len(rows)
+                if progress is not None:
+                    progress(added)
+            self._synced = (db, version)
+            return added
+
+    def _float32_rows(self, matrix):
+        """
+        Return the matrix's rows as float32, from the copy kept in memory. Rows
+        are only appended, so just the rows added since the last search are
+        cast. Returns None if the copy would not fit in SEARCH_CACHE_MB.
+        """
+        rows = len(matrix)
+        budget_rows = SEARCH_CACHE_MB * 1024 * 1024 // (self.dimensions * 4)
+        if rows > budget_rows:
+            return None
+        with self._resident_lock:
+            resident, filled = self._resident or (None, 0)
+            if filled > rows:
+                resident, filled = None, 0
+            if filled < rows:
+                if resident is None or len(resident) < rows:
+                    # Room to grow, so appends do not copy the whole matrix each time
+                    grown = np.empty((min(rows + rows // 4, budget_rows), self.dimensions), dtype=np.float32)
+                    if filled:
+                        grown[:filled] = resident[:filled]
+                    resident = grown
+                resident[filled:rows] = matrix[filled:rows]
+                self._resident = (resident, rows)
+            return resident[:rows]
+
+    @staticmethod
+    def _score_block(matrix, ids, start, query):
+        """Cosine scores of one block of rows, dead rows scored -inf"""
+        block = np.asarray(matrix[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        scores = block @ query
+        scores[ids[start:start + SEARCH_BLOCK_ROWS] <= 0] = -np.inf
+        return scores
+
+    def search_vector(self, query, k=10):
+        """
+        Return the (scan_results id, score) pairs of the k rows closest to a unit
+        query vector, best first. The in-memory float32 copy is scored with one
+        product; a matrix too large for it is scored block by block from the
+        memory map, in parallel. The best k are picked with argpartition, not a
+        full sort.
+        """
+        matrix, ids = self._matrix, self._ids
+        rows = len(ids)
+        if not rows:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        resident = self._float32_rows(matrix)
+        starts = range(0, rows, SEARCH_BLOCK_ROWS)
+        if resident is not None:
+            scores = resident @ query
+            scores[ids <= 0] = -np.inf
+        elif len(starts) > 1 and SEARCH_THREADS > 1:
+            with ThreadPoolExecutor(max_workers=SEARCH_THREADS) as executor:
+                scores = np.concatenate(list(executor.map(lambda start: self._score_block(matrix, ids, start, query), starts)))
+        else:
+            scores = np.concatenate([self._score_block(matrix, ids, start, query) for start in starts])
+
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[row]), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def search(self, db, text, k=10):
+        """Return the scan_results rows whose descriptions are closest in meaning to `text`, with a 'score'"""
+        query = embed([QUERY_PREFIX + text], self.model, self.dimensions)[0]
+        matches = self.search_vector(query, k)
+        if not matches:
+            return []
+        rows = {row['id']: row for row in db.get_results({'ids': [match_id for match_id, _ in matches]})}
+        results = []
+        for match_id, score in matches:
+            if match_id in rows:
+                results.append({**rows[match_id], 'score': score})
+        return results
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+def get_index(db_file='scanner_results.db'):
+    """Return the embedding index kept next to a database file, one per file"""
+    prefix = os.path.splitext(os.path.abspath(db_file))[0] + '_embeddings'
+    with _index_lock:
+        if prefix not in _indexes:
+            _indexes[prefix] = EmbeddingIndex(prefix)
+        return _indexes[prefix]
@@ -0,0 +1,12 @@
+import hashlib
+
+# Read files in 1 MB blocks so large drawings and scans never sit in memory whole
+CHUNK_SIZE = 1024 * 1024
+
+def hash_file(file_path, algorithm='sha256'):
+    """Return the hex digest of a file's contents"""
+    digest = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
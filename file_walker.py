@@ -0,0 +1,57 @@
+import os
+from collections import namedtuple
+
+# A file found by walk_files, with the stat data needed for the rest of the scan
+FileEntry = namedtuple('FileEntry', ['path', 'name', 'size', 'mtime', 'ctime'])
+
+def walk_key(relative_path):
+    """
+    Sort key for a file's path relative to the scan root, matching the order
+    walk_files yields files in: a directory's own files (by name) come before
+    its subdirectories (by name).
+    """
+    parts = relative_path.split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def walk_files(directory_path, start_after=None):
+    """
+    Yield a FileEntry for every file below directory_path.
+
+    Uses os.scandir with an explicit stack instead of os.walk, and stats each
+    file exactly once so later steps never need to touch the filesystem again.
+    Directories that cannot be read are skipped, like os.walk does.
+
+    Files are yielded in a fixed order (see walk_key). Pass the relative path
+    of a file as `start_after` to resume after it; subtrees that lie entirely
+    before that file are not listed at all.
+    """
+    cursor = walk_key(start_after) if start_after else None
+    stack = [(directory_path, ())]
+    while stack:
+        current, prefix = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    key = prefix + ((1, entry.name),)
+                    # Skip subtrees that were finished before the cursor
+                    if cursor is not None and key < cursor[:len(key)]:
+                        continue
+                    subdirs.append((entry.path, key))
+                elif entry.is_file():
+                    if cursor is not None and prefix + ((0, entry.name),) <= cursor:
+                        continue
+                    stats = entry.stat()
+                    yield FileEntry(entry.path, entry.name, stats.st_size,
+                                    stats.st_mtime, stats.st_ctime)
+            except OSError:
+                continue
+        
+        # Visit subdirectories in listing order
+        stack.extend(reversed(subdirs))
@@ -1,12 +1,17 @@
 #Generate Description of the image using Llava 7B, a vision model based on Llama, this is a good compromise between cost and accuracy
+import os
+import time
 import ollama
+from description_cache import get_cache
+from image_preprocessor import prepare_image, get_preprocess_stats, PREPROCESS_ENABLED, MAX_IMAGE_SIDE
 
-def generate_description(image_path, mode='detailed'):
+def generate_description(image_path, mode='detailed', file_size=None):
     """
     Generate a description of an image using different modes:
     - detailed: Technical and comprehensive description
     - concise: Brief, focused description
     - creative: More artistic/narrative description
+    `file_size` is the size from the directory walk, if the caller has it.
     """
     try:
         # Set the prompt based on the mode
@@ -24,15 +29,39 @@ def generate_description(image_path, mode='detailed'):
         # Get appropriate prompt or fall back to default
         content = prompts.get(mode.lower(), prompts['default'])
         
+        # Reuse the description of an identical file if one was already generated
+        cache = get_cache()
+        # Descriptions of downsized images are kept apart from full-size ones
+        model_key = f'llava@{MAX_IMAGE_SIDE}px' if PREPROCESS_ENABLED else 'llava'
+        cache_key = cache.make_key(image_path, model_key, mode.lower(), content)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Downsize and re-encode the image in memory before sending it
+        if file_size is None:
+            file_size = os.path.getsize(image_path)
+        prepare_start = time.perf_counter()
+        if PREPROCESS_ENABLED:
+            image, sent_bytes = prepare_image(image_path, original_size=file_size)
+        else:
+            image, sent_bytes = image_path, file_size
+        prepare_seconds = time.perf_counter() - prepare_start
+        
         # Format the message for Ollama
         messages = [{
             'role': 'user',
             'content': content,
-            'images': [image_path]
+            'images': [image]
         }]
         
         # Generate the response
+        describe_start = time.perf_counter()
         response = ollama.chat(model='llava', messages=messages)
+        get_preprocess_stats().record(
+            os.path.splitext(image_path)[1].lower(), file_size, sent_bytes,
+            prepare_seconds, time.perf_counter() - describe_start
+        )
         
         # Format and clean up the response
         description = response['message']['content'].strip()
@@ -42,7 +71,8 @@ def generate_description(image_path, mode='detailed'):
             # Take first few sentences
             sentences = description.split('.')[:3]
             description = '. '.join(sentences) + '.'
-            
+        
+        cache.put(cache_key, description)
         return description
         
     except Exception as e:
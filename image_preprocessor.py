@@ -0,0 +1,103 @@
+#Shrink images before they are sent to llava. The model only sees a small resized input,
+#so shipping a 40 MB TIFF or a 24 MP phone photo to Ollama just costs encode and transfer time
+import io
+import os
+import threading
+from PIL import Image, ImageOps
+
+# Longest side of the image sent to llava, in pixels
+MAX_IMAGE_SIDE = int(os.getenv('LLAVA_MAX_IMAGE_SIDE', '1024'))
+
+# JPEG quality of the re-encoded image
+JPEG_QUALITY = int(os.getenv('LLAVA_JPEG_QUALITY', '85'))
+
+# Set LLAVA_PREPROCESS=0 to send original files, e.g. to compare latency
+PREPROCESS_ENABLED = os.getenv('LLAVA_PREPROCESS', '1') != '0'
+
+def prepare_image(image_path, max_side=MAX_IMAGE_SIDE, quality=JPEG_QUALITY, original_size=None):
+    """
+    Return the image to send to Ollama and its size in bytes.
+
+    The image is decoded at reduced resolution where the format allows it
+    (JPEG draft mode decodes at 1/2, 1/4 or 1/8 scale directly), scaled so its
+    longest side is at most `max_side`, and re-encoded as a JPEG in memory.
+    A JPEG that is already small enough is sent as it is. Anything Pillow
+    cannot read is left to Ollama by returning the original path. Pass the
+    file size from the directory walk as `original_size` to save a stat.
+    """
+    if original_size is None:
+        original_size = os.path.getsize(image_path)
+    try:
+        with Image.open(image_path) as img:
+            if img.format == 'JPEG' and max(img.size) <= max_side:
+                return image_path, original_size
+
+            # Let the decoder skip detail that would be thrown away anyway
+            img.draft('RGB', (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+
+            # JPEG has no alpha channel, so flatten transparent images onto white
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=quality, optimize=True)
+            data = buffer.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return image_path, original_size
+
+    # Re-encoding can occasionally make a small file bigger
+    if len(data) >= original_size:
+        return image_path, original_size
+    return data, len(data)
+
+class PreprocessStats:
+    """Per file type totals of bytes sent and time spent, shared by scan worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.by_type = {}
+
+    def record(self, file_type, original_bytes, sent_bytes, prepare_seconds, describe_seconds):
+        with self._lock:
+            totals = self.by_type.setdefault(file_type, {
+                'files': 0, 'original_bytes': 0, 'sent_bytes': 0,
+                'prepare_seconds': 0.0, 'describe_seconds': 0.0
+            })
+            totals['files'] += 1
+            totals['original_bytes'] += original_bytes
+            totals['sent_bytes'] += sent_bytes
+            totals['prepare_seconds'] += prepare_seconds
+            totals['describe_seconds'] += describe_seconds
+
+    def report(self):
+        """Return one line per file type, for printing after a scan"""
+        lines = []
+        with self._lock:
+            for file_type, totals in sorted(self.by_type.items()):
+                files = totals['files']
+                saved = totals['original_bytes'] - totals['sent_bytes']
+                percent = 100 * saved / totals['original_bytes'] if totals['original_bytes'] else 0
+                lines.append(
+                    f"{file_type}: {files} files, {saved / (1024 * 1024):.1f} MB saved ({percent:.0f}%), "
+                    f"prepare {1000 * totals['prepare_seconds'] / files:.0f} ms/file, "
+                    f"describe {totals['describe_seconds'] / files:.2f} s/file"
+                )
+        return lines
+
+_stats = PreprocessStats()
+
+def get_preprocess_stats():
+    """Return the totals shared by every describe call in this process"""
+    return _stats
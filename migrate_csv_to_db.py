@@ -1,55 +1,94 @@
+import argparse
+import sys
+import time
 import pandas as pd
 from database import Database
 from datetime import datetime
 import os
 
-def migrate_csv_to_db(csv_file=r'C:\Users\Joseph\Documents\code\misc\LlavaNetScanner\ouput.csv'):
-    # Initialize database
-    db = Database()
+# Rows read from the CSV and written in one transaction at a time
+CHUNK_ROWS = 50000
+
+def prepare_chunk(chunk, stat_files=False):
+    """Turn a chunk of CSV rows into scan result dicts for Database.import_scan_results"""
+    # Clean up the path - remove any problematic characters
+    chunk['Path'] = chunk['Path'].str.strip()
     
+    # Ensure we have all required fields
+    if 'Filename' not in chunk:
+        chunk['Filename'] = chunk['Path'].map(os.path.basename)
+    
+    results = chunk.to_dict('records')
+    if not stat_files:
+        # Add placeholder file stats since we can't access the original files
+        placeholder = {
+            'size': 0,  # We'll update this when we actually scan the file
+            'mtime': datetime.now().timestamp()
+        }
+        for result in results:
+            result['_file_stats'] = placeholder
+    return results
+
+def migrate_csv_to_db(csv_file=r'C:\Users\Joseph\Documents\code\misc\LlavaNetScanner\ouput.csv',
+                      db_file='scanner_results.db', chunk_size=CHUNK_ROWS, stat_files=False):
+    """
+    Import a CSV export into the database without loading it whole. The CSV
+    is read `chunk_size` rows at a time and each chunk is written with one
+    executemany in one transaction. With `stat_files` each path is stat'ed for
+    its size and modification time; by default the files are assumed to be
+    out of reach and get placeholder stats.
+    """
     print(f"Reading CSV file: {csv_file}")
     
-    # Read CSV file
-    df = pd.read_csv(csv_file)
-    print(f"Found {len(df)} records in CSV")
+    # Every row is keyed by its path, so a CSV without one cannot be imported
+    columns = pd.read_csv(csv_file, nrows=0).columns
+    if 'Path' not in columns:
+        sys.exit(f"{csv_file} has no Path column (found: {', '.join(columns) or 'none'})")
+    
+    # Initialize database
+    db = Database(db_file)
     
     success_count = 0
     error_count = 0
+    start_time = time.perf_counter()
     
-    # Migrate each row to database
-    for _, row in df.iterrows():
+    # Empty cells stay empty strings instead of becoming NaN
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        results = prepare_chunk(chunk, stat_files)
         try:
-            data = row.to_dict()
-            
-            # Add placeholder file stats since we can't access the original files
-            data['_file_stats'] = {
-                'size': 0,  # We'll update this when we actually scan the file
-                'mtime': datetime.now().timestamp()
-            }
-            
-            # Clean up the path - remove any problematic characters
-            if 'Path' in data:
-                data['Path'] = data['Path'].strip()
-            
-            # Ensure we have all required fields
-            if 'Filename' not in data and 'Path' in data:
-                data['Filename'] = os.path.basename(data['Path'])
-            
-            db.add_scan_result(data)
-            success_count += 1
-            
-            # Print progress every 100 records
-            if success_count % 100 == 0:
-                print(f"Processed {success_count} records...")
-            
+            success_count += db.import_scan_results(results)
         except Exception as e:
-            print(f"Error processing record: {str(e)}")
-            error_count += 1
+            # Write the chunk row by row to find the bad records
+            print(f"Error importing chunk, retrying row by row: {str(e)}")
+            for result in results:
+                try:
+                    db.add_scan_result(result)
+                    success_count += 1
+                except Exception as e:
+                    print(f"Error processing record: {str(e)}")
+                    error_count += 1
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"Processed {success_count + error_count} records "
+              f"({(success_count + error_count) / elapsed:.0f} rows/sec)...")
     
+    elapsed = time.perf_counter() - start_time
     print(f"\nMigration complete:")
     print(f"Successfully migrated: {success_count} records")
     print(f"Errors encountered: {error_count} records")
-    print(f"Total processed: {len(df)} records")
+    print(f"Total processed: {success_count + error_count} records")
+    print(f"Elapsed: {elapsed:.1f}s ({(success_count + error_count) / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
 
 if __name__ == "__main__":
-    migrate_csv_to_db() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import a scanner CSV export into the database")
+    parser.add_argument('csv_file', nargs='?', help="CSV file to import")
+    parser.add_argument('--db', default='scanner_results.db', help="Database file to import into")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help="Rows per transaction")
+    parser.add_argument('--stat-files', action='store_true',
+                        help="Read size and modification time from the files, if they are reachable")
+    args = parser.parse_args()
+    
+    kwargs = {'db_file': args.db, 'chunk_size': args.chunk_size, 'stat_files': args.stat_files}
+    if args.csv_file:
+        kwargs['csv_file'] = args.csv_file
+    migrate_csv_to_db(**kwargs)
@@ -1,7 +1,26 @@
+import glob
+import gzip
+import hashlib
+import json
 import os
+import time
+from datetime import datetime
 import matplotlib.pyplot as plt
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
+from database import Database
+from duplicate_finder import find_duplicates, reclaimable_space
+
+# Directories listed at the same time. The walk waits on the file server for
+# every listing and stat, so far more threads than cores still pay off on a share
+WALK_WORKERS = int(os.getenv('NETGRAPHER_WORKERS', '32'))
+
+# Where per-directory snapshots are kept between runs
+SNAPSHOT_DIR = os.getenv('NETGRAPHER_SNAPSHOTS', 'netgrapher_snapshots')
+
+# Files without an extension larger than this are reported after the walk
+LARGE_FILE_BYTES = (1024 ** 3) * 0.125
 
 category_colors = {
     'Images(.jpg, .png, etc.)': '#FF6B6B',
@@ -55,37 +74,278 @@ def get_file_category(ext, filename):  # Add filename parameter
         return filename
     return 'No Extension'
 
-def analyze_directory(directory_path):
-    # Get directory name from path
-    dir_name = os.path.basename(os.path.normpath(directory_path))
+def categorize_file(file):
+    """Return the extension and category a file is counted under"""
+    if file.startswith('.'):
+        return file, 'system'
+    ext = os.path.splitext(file)[1].lower() or 'no extension'
+    return ext, get_file_category(ext, file)  # Pass filename
+
+def scan_directory_sizes(path, previous=None, collect_files=False):
+    """
+    Total one directory's files by category. Runs on a walker thread.
+
+    Returns (record, reused), where record holds the directory's mtime, its
+    per-category byte totals, file count, subdirectory names and files without
+    an extension, or None if the directory cannot be read. If `previous` (the
+    record from the last snapshot) has the same mtime, no file was added,
+    removed or renamed here since, so it is returned without listing.
+    With `collect_files` the record also lists (path, size) of every file,
+    under 'file_sizes', which is not kept in snapshots.
+    """
+    try:
+        # Taken before listing, so a change made meanwhile is seen next run
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, False
+    if previous is not None and previous['mtime'] == mtime:
+        return previous, True
     
-    category_sizes = defaultdict(int)
-    total_size = 0
-    large_no_ext_files = []  # Track large files without extensions
-    
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                size = os.path.getsize(file_path)
-                if file.startswith('.'):
-                    ext = file
-                    category = 'system'
-                else:
-                    ext = os.path.splitext(file)[1].lower() or 'no extension'
-                    category = get_file_category(ext, file)  # Pass filename
+    record = {'mtime': mtime, 'sizes': defaultdict(int), 'files': 0, 'subdirs': [], 'no_ext': []}
+    if collect_files:
+        record['file_sizes'] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    # Like os.walk, symlinked directories are neither counted nor entered
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            record['subdirs'].append(entry.name)
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
                 
-                category_sizes[category] += size
-                total_size += size
+                file = entry.name
+                ext, category = categorize_file(file)
                 
-                # Track files >0.125GB without extension
+                record['sizes'][category] += size
+                record['files'] += 1
+                if collect_files:
+                    record['file_sizes'].append((entry.path, size))
                 if ext == 'no extension':
+                    record['no_ext'].append((file, size))
+    except OSError:
+        return None, False
+    return record, False
+
+def walk_sizes(directory_path, workers=WALK_WORKERS, max_depth=None, progress=None, previous=None,
+               collect_files=False):
+    """
+    Total file sizes by category below directory_path.
+
+    Every directory is its own task on a thread pool, so idle threads pick up
+    whichever directory is waiting next and one deep subtree never holds up
+    the rest. Each task lists its directory with os.scandir, takes sizes from
+    DirEntry.stat() and returns its own totals, which are merged here as tasks
+    finish.
+
+    Pass the snapshot of an earlier run as `previous` and directories whose
+    mtime has not changed reuse its totals; only their mtime is read. A file
+    rewritten in place does not change its directory's mtime, so walk without
+    `previous` now and then for an exact recount. The returned stats include 'snapshot', the per-directory records of this run
+    keyed by path relative to directory_path, for save_snapshot.
+
+    max_depth limits how many levels below directory_path are entered (0 only
+    counts the files directly in it). progress(stats, current_path) is called
+    after each directory with the running totals. With `collect_files` every
+    directory is listed and stats['file_sizes'] holds (path, size) of every
+    file, e.g. for duplicate_finder.
+    """
+    # Reused directories are not listed, so they cannot report their files
+    previous_dirs = previous['directories'] if previous and not collect_files else {}
+    stats = {
+        'category_sizes': defaultdict(int),
+        'total_size': 0,
+        'files': 0,
+        'directories': 0,
+        'reused': 0,
+        'large_no_ext_files': [],  # Track large files without extensions
+        'file_sizes': [],
+        'snapshot': {}
+    }
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {}
+        
+        def visit(path, relative, depth):
+            future = executor.submit(scan_directory_sizes, path, previous_dirs.get(relative), collect_files)
+            pending[future] = (path, relative, depth)
+        
+        visit(directory_path, '', 0)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, relative, depth = pending.pop(future)
+                record, reused = future.result()
+                if record is None:
+                    continue
+                if collect_files:
+                    stats['file_sizes'].extend(record.pop('file_sizes'))
+                
+                stats['snapshot'][relative] = record
+                for category, size in record['sizes'].items():
+                    stats['category_sizes'][category] += size
+                    stats['total_size'] += size
+                stats['files'] += record['files']
+                stats['directories'] += 1
+                stats['reused'] += reused
+                
+                # Track files >0.125GB without extension
+                for file, size in record['no_ext']:
+                    file_path = os.path.join(path, file)
                     print(file_path)
-                    if size > ((1024 ** 3)*0.125):
-                        large_no_ext_files.append((file_path, convert_size(size)))
-                    
-            except (OSError, FileNotFoundError):
-                continue
+                    if size > LARGE_FILE_BYTES:
+                        stats['large_no_ext_files'].append((file_path, convert_size(size)))
+                
+                if max_depth is None or depth < max_depth:
+                    for subdir in record['subdirs']:
+                        visit(os.path.join(path, subdir), os.path.join(relative, subdir), depth + 1)
+                
+                if progress is not None:
+                    progress(stats, path)
+    return stats
+
+def snapshot_prefix(directory_path):
+    """File name prefix of the snapshots of one directory"""
+    root = os.path.abspath(directory_path)
+    digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(os.path.normpath(root)) or 'root'}-{digest}"
+
+def build_snapshot(directory_path, stats):
+    """Snapshot of a walk: the per-directory records from walk_sizes and when they were taken"""
+    return {
+        'root': os.path.abspath(directory_path),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'directories': stats['snapshot']
+    }
+
+def save_snapshot(snapshot, snapshot_dir=SNAPSHOT_DIR):
+    """Write a snapshot to a gzipped JSON file and return its path"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    created = datetime.fromisoformat(snapshot['created'])
+    path = os.path.join(snapshot_dir, f"{snapshot_prefix(snapshot['root'])}-{created:%Y%m%d-%H%M%S}.json.gz")
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    return path
+
+def load_snapshot(path):
+    """Read a snapshot written by save_snapshot"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_snapshots(directory_path, snapshot_dir=SNAPSHOT_DIR):
+    """Snapshot files of a directory, oldest first"""
+    pattern = os.path.join(glob.escape(snapshot_dir), glob.escape(snapshot_prefix(directory_path)) + '-*.json.gz')
+    return sorted(glob.glob(pattern))
+
+def snapshot_totals(snapshot):
+    """Bytes per category and per top-level directory ('.' for files in the root itself)"""
+    categories = defaultdict(int)
+    top_dirs = defaultdict(int)
+    for relative, record in snapshot['directories'].items():
+        top = relative.split(os.sep)[0] if relative else '.'
+        for category, size in record['sizes'].items():
+            categories[category] += size
+            top_dirs[top] += size
+    return categories, top_dirs
+
+def diff_snapshots(old, new):
+    """
+    Growth between two snapshots of the same directory, as two lists of
+    (name, old bytes, new bytes) sorted by the change, largest growth first:
+    one by category and one by top-level directory.
+    """
+    diffs = []
+    for old_totals, new_totals in zip(snapshot_totals(old), snapshot_totals(new)):
+        rows = [(name, old_totals.get(name, 0), new_totals.get(name, 0))
+                for name in set(old_totals) | set(new_totals)]
+        rows.sort(key=lambda row: row[2] - row[1], reverse=True)
+        diffs.append(rows)
+    return diffs
+
+def print_diff(old, new, limit=15):
+    """Print what grew or shrank between two snapshots"""
+    by_category, by_directory = diff_snapshots(old, new)
+    print(f"\nChanges from {old['created']} to {new['created']}:")
+    for title, rows in (("By file type", by_category), ("By top-level directory", by_directory)):
+        print(f"\n{title}:")
+        for name, old_size, new_size in rows[:limit]:
+            if old_size != new_size:
+                print(f"{name}: {convert_size(old_size):.2f} GB -> {convert_size(new_size):.2f} GB "
+                      f"({convert_size(new_size - old_size):+.2f} GB)")
+
+def plot_diff(old, new, limit=15):
+    """Bar chart of the growth per file type between two snapshots"""
+    by_category, _ = diff_snapshots(old, new)
+    rows = [row for row in by_category if row[1] != row[2]][:limit]
+    if not rows:
+        print("No changes between the snapshots")
+        return
+    names = [name for name, _, _ in rows]
+    changes = [convert_size(new_size - old_size) for _, old_size, new_size in rows]
+    
+    plt.figure(figsize=(12, 6))
+    plt.barh(names, changes, color=[category_colors.get(name, '#C0C0C0') for name in names])
+    plt.axvline(0, color='black', linewidth=0.8)
+    plt.gca().invert_yaxis()
+    plt.xlabel('Change (GB)')
+    plt.title(f"{os.path.basename(new['root'])} Storage Growth\n{old['created']} to {new['created']}",
+              size=12, weight='bold')
+    plt.tight_layout()
+    plt.show()
+
+def print_progress(interval=2.0):
+    """Build a progress callback that prints the running totals every `interval` seconds"""
+    last_report = 0.0
+    
+    def progress(stats, current_path):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < interval:
+            return
+        last_report = now
+        print(f"{stats['directories']} directories, {stats['files']} files, "
+              f"{convert_size(stats['total_size']):.2f} GB - {current_path}")
+    
+    return progress
+
+def analyze_directory(directory_path, workers=WALK_WORKERS, max_depth=None, progress=None,
+                      incremental=True, snapshot_dir=SNAPSHOT_DIR, duplicates=False, db_file=None):
+    # Absolute paths, so recorded duplicates match the scanner's lookups by path
+    directory_path = os.path.abspath(directory_path)
+    
+    # Get directory name from path
+    dir_name = os.path.basename(os.path.normpath(directory_path))
+    
+    # Reuse the totals of unchanged directories from the last snapshot
+    snapshots = list_snapshots(directory_path, snapshot_dir)
+    previous = load_snapshot(snapshots[-1]) if incremental and snapshots else None
+    
+    stats = walk_sizes(directory_path, workers=workers, max_depth=max_depth, progress=progress,
+                       previous=previous, collect_files=duplicates)
+    snapshot = build_snapshot(directory_path, stats)
+    snapshot_path = save_snapshot(snapshot, snapshot_dir)
+    print(f"Listed {stats['directories'] - stats['reused']} of {stats['directories']} directories, "
+          f"snapshot saved to {snapshot_path}")
+    category_sizes = stats['category_sizes']
+    total_size = stats['total_size']
+    large_no_ext_files = stats['large_no_ext_files']
+    
+    # Space freed by keeping one copy of every duplicated file
+    reclaimable = {}
+    if duplicates:
+        duplicate_stats = {}
+        groups = find_duplicates(stats.pop('file_sizes'), stats=duplicate_stats)
+        reclaimable = reclaimable_space(groups, lambda path: categorize_file(os.path.basename(path))[1])
+        stats['duplicate_groups'] = groups
+        stats['reclaimable'] = reclaimable
+        print(f"Duplicates: {duplicate_stats['same_size']} files share a size, "
+              f"{duplicate_stats['fully_read']} read in full, {len(groups)} groups")
+        # Lets the scanner copy descriptions between the copies
+        if db_file:
+            Database(db_file).record_duplicate_groups(groups, directory_path)
     
     total_gb = convert_size(total_size)
     percentages = {}
@@ -159,7 +419,10 @@ def analyze_directory(directory_path):
               loc="center left",
               bbox_to_anchor=(1, 0, 0.5, 1))
     
-    plt.title(f'{dir_name} Storage Distribution by File Type\nTotal Size: {total_gb:.2f} GB',
+    title = f'{dir_name} Storage Distribution by File Type\nTotal Size: {total_gb:.2f} GB'
+    if duplicates:
+        title += f', {convert_size(sum(reclaimable.values())):.2f} GB in duplicate copies'
+    plt.title(title,
              pad=20,
              size=12,
              weight='bold')
@@ -182,11 +445,23 @@ def analyze_directory(directory_path):
         for file_path, size_gb in sorted(large_no_ext_files, key=lambda x: x[1], reverse=True):
             print(f"{file_path}: {size_gb:.2f} GB")
     
+    if reclaimable:
+        print("\nReclaimable space from duplicate copies:")
+        for category, size in sorted(reclaimable.items(), key=lambda item: item[1], reverse=True):
+            print(f"{category}: {convert_size(size):.2f} GB")
+    
+    # What changed since the previous run
+    if previous:
+        print_diff(previous, snapshot)
+    
     plt.show()
+    return stats
 
 if __name__ == "__main__":
     directory = input("Enter directory path to analyze: ")
     if os.path.exists(directory):
-        analyze_directory(directory)
+        duplicates = input("Also look for duplicate files? (y/n): ").strip().lower() == 'y'
+        analyze_directory(directory, progress=print_progress(), duplicates=duplicates,
+                          db_file='scanner_results.db' if duplicates else None)
     else:
         print("Invalid directory path!")
\ No newline at end of file
@@ -0,0 +1,253 @@
+#Command line entry point: `python netscanner_cli.py {scan,stats,export,graph,importtime}`.
+#Only the standard library and database.py are imported up front; the describers, pandas and
+#the plotting libraries are imported by the subcommands that use them, so --help and stats start fast
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from database import Database
+
+# Default database file, shared with the Streamlit app
+DB_FILE = 'scanner_results.db'
+
+# Startup budget for `--help` and `stats`, checked by the importtime subcommand
+STARTUP_BUDGET_MS = 200
+
+# Modules that must not be imported just to start the CLI; test_netscanner_cli.py enforces this
+HEAVY_MODULES = ('pandas', 'numpy', 'ollama', 'fitz', 'pymupdf', 'PIL', 'matplotlib', 'plotly', 'streamlit')
+
+# Columns written by export; migrate_csv_to_db reads the same names back
+EXPORT_COLUMNS = [
+    ('Filename', 'filename'), ('Path', 'file_path'), ('Contractor', 'contractor'),
+    ('Project', 'project'), ('Description', 'description'), ('file_type', 'file_type'),
+    ('file_size', 'file_size'), ('scan_date', 'scan_date'), ('last_modified', 'last_modified')
+]
+
+def open_database(path, must_exist=True):
+    """Open the scanner database, or exit with a message if there is none yet"""
+    if must_exist and not os.path.exists(path):
+        sys.exit(f"No database at {path}. Run `scan` first or pass --db.")
+    return Database(path)
+
+def result_filters(args):
+    """Database.get_results filters from the --contractor/--project/--file-type options"""
+    return {
+        'contractors': args.contractor,
+        'projects': args.project,
+        'file_types': [file_type.lower() for file_type in args.file_type],
+        'search': args.search
+    }
+
+def cmd_scan(args):
+    """Describe new files below a directory, or only count them with --dry-run"""
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Not a directory: {args.directory}")
+
+    import NetScanner
+    if args.cutoff:
+        NetScanner.CUTOFF_DATE = datetime.fromisoformat(args.cutoff)
+
+    if args.dry_run:
+        from file_walker import walk_files
+        found = valid = 0
+        size = 0
+        cutoff = NetScanner.CUTOFF_DATE.timestamp()
+        for entry in walk_files(args.directory):
+            found += 1
+            if NetScanner.is_valid_file(entry.name) and entry.ctime > cutoff:
+                valid += 1
+                size += entry.size
+        print(f"{found} files, {valid} would be described ({size / (1024 * 1024):.1f} MB)")
+        return 0
+
+    db = open_database(args.db, must_exist=False)
+    NetScanner.scan_files_in_directory(
+        args.directory, db,
+        workers=args.workers,
+        incremental=args.incremental,
+        use_hash=args.hash,
+        resume=args.resume,
+        description_mode=args.mode
+    )
+    return 0
+
+def cmd_stats(args):
+    """Print totals from the summary table"""
+    db = open_database(args.db)
+    stats = db.get_statistics()
+    total_size = sum(totals['size'] or 0 for totals in stats['file_types'].values())
+    print(f"Files: {stats['total_files']}")
+    print(f"Total size: {total_size / (1024 ** 3):.2f} GB")
+    print(f"Contractors: {len(stats['contractors'])}")
+    print(f"Projects: {len(stats['projects'])}")
+    print("\nBy file type:")
+    for file_type, totals in sorted(stats['file_types'].items(), key=lambda item: item[1]['size'] or 0,
+                                    reverse=True):
+        print(f"{file_type or '(none)'}: {totals['count']} files, "
+              f"{(totals['size'] or 0) / (1024 * 1024):.1f} MB")
+    return 0
+
+def cmd_export(args):
+    """Write scan results as CSV, streamed from the database"""
+    db = open_database(args.db)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        writer = csv.writer(output)
+        writer.writerow([header for header, _ in EXPORT_COLUMNS])
+        rows = 0
+        for row in db.iter_results(result_filters(args)):
+            writer.writerow([row[column] for _, column in EXPORT_COLUMNS])
+            rows += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if output is not sys.stdout:
+        print(f"Exported {rows} rows to {args.output}")
+    return 0
+
+def cmd_graph(args):
+    """Chart storage by file type with netgrapher, or diff its last two snapshots"""
+    import netgrapher
+
+    if args.diff:
+        snapshots = netgrapher.list_snapshots(args.directory)
+        if len(snapshots) < 2:
+            sys.exit(f"Need two snapshots of {args.directory} to diff, found {len(snapshots)}")
+        old, new = (netgrapher.load_snapshot(path) for path in snapshots[-2:])
+        netgrapher.print_diff(old, new)
+        if args.plot:
+            netgrapher.plot_diff(old, new)
+        return 0
+
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Not a directory: {args.directory}")
+    netgrapher.analyze_directory(
+        args.directory,
+        workers=args.workers,
+        max_depth=args.max_depth,
+        progress=netgrapher.print_progress(),
+        incremental=not args.full,
+        duplicates=args.duplicates,
+        db_file=args.db if args.duplicates else None
+    )
+    return 0
+
+def measure_startup(argv, runs=3):
+    """Best wall time in ms of running this CLI with `argv` in a fresh interpreter"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__)] + argv,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def import_times(code):
+    """
+    Run `code` under `python -X importtime` and return the modules it imported
+    as {name: cumulative microseconds}, plus the total for top-level imports.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=False
+    )
+    modules = {}
+    total = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        # Nested imports are indented under the module that imported them
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return modules, total
+
+def cmd_importtime(args):
+    """
+    Report how fast the CLI starts: the slowest imports, any of HEAVY_MODULES
+    that were loaded, and the time --help and stats take against the budget.
+    Exits with 1 on a regression. The import rule itself is enforced by
+    test_netscanner_cli.py; this is for looking into a failure or timing.
+    """
+    failed = False
+
+    modules, total = import_times("import netscanner_cli; netscanner_cli.build_parser()")
+    print(f"Import time of the CLI: {total / 1000:.1f} ms")
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    heavy = sorted({name.split('.')[0] for name in modules} & set(HEAVY_MODULES))
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+
+    checks = [('--help', ['--help'])]
+    if os.path.exists(args.db):
+        checks.append(('stats', ['--db', args.db, 'stats']))
+    for label, argv in checks:
+        elapsed = measure_startup(argv)
+        status = 'ok' if elapsed <= args.budget else 'FAIL'
+        print(f"{label}: {elapsed:.0f} ms (budget {args.budget} ms) {status}")
+        failed = failed or elapsed > args.budget
+
+    return 1 if failed else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='netscanner', description="Scan, summarise and chart network shares")
+    parser.add_argument('--db', default=DB_FILE, help=f"Scanner database (default {DB_FILE})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('scan', help="Describe new files below a directory")
+    scan.add_argument('directory')
+    scan.add_argument('--workers', type=int, default=int(os.getenv('DESCRIBE_WORKERS', '4')),
+                      help="Files described at the same time")
+    scan.add_argument('--mode', choices=['detailed', 'concise', 'creative'], default='detailed',
+                      help="Style of image descriptions")
+    scan.add_argument('--cutoff', help="Only describe files created after this date (YYYY-MM-DD)")
+    scan.add_argument('--incremental', action='store_true', help="Describe changed files again")
+    scan.add_argument('--hash', action='store_true', help="With --incremental, confirm changes by content hash")
+    scan.add_argument('--resume', action='store_true', help="Continue the last unfinished scan of the directory")
+    scan.add_argument('--dry-run', action='store_true', help="Only walk and count the files that would be described")
+    scan.set_defaults(func=cmd_scan)
+
+    stats = subparsers.add_parser('stats', help="Print totals by file type")
+    stats.set_defaults(func=cmd_stats)
+
+    export = subparsers.add_parser('export', help="Write results as CSV")
+    export.add_argument('-o', '--output', default='-', help="CSV file to write (default stdout)")
+    export.add_argument('--contractor', action='append', default=[], help="Only this contractor (repeatable)")
+    export.add_argument('--project', action='append', default=[], help="Only this project (repeatable)")
+    export.add_argument('--file-type', action='append', default=[], help="Only this extension, e.g. .pdf (repeatable)")
+    export.add_argument('--search', help="Only results whose filename or description match these words")
+    export.set_defaults(func=cmd_export)
+
+    graph = subparsers.add_parser('graph', help="Chart storage by file type")
+    graph.add_argument('directory')
+    graph.add_argument('--workers', type=int, default=int(os.getenv('NETGRAPHER_WORKERS', '32')),
+                       help="Directories listed at the same time")
+    graph.add_argument('--max-depth', type=int, help="Levels below the directory to enter")
+    graph.add_argument('--full', action='store_true', help="Walk every directory instead of reusing the last snapshot")
+    graph.add_argument('--duplicates', action='store_true', help="Also find duplicate files and record them in --db")
+    graph.add_argument('--diff', action='store_true', help="Print what changed between the last two snapshots")
+    graph.add_argument('--plot', action='store_true', help="With --diff, also chart the changes")
+    graph.set_defaults(func=cmd_graph)
+
+    importtime = subparsers.add_parser('importtime', help="Report CLI startup time and imports")
+    importtime.add_argument('--budget', type=int, default=STARTUP_BUDGET_MS, help="Milliseconds allowed")
+    importtime.add_argument('--top', type=int, default=10, help="Slowest imports to list")
+    importtime.set_defaults(func=cmd_importtime)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
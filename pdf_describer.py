@@ -1,15 +1,232 @@
+import io
+import os
+import json
+import multiprocessing
+import threading
 import ollama
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from description_cache import get_cache
+from image_preprocessor import MAX_IMAGE_SIDE, JPEG_QUALITY
 try:
     import fitz  # PyMuPDF
 except ImportError:
     print("Warning: PyMuPDF not installed. PDF text extraction will be limited.")
     fitz = None
 
-def describe_pdf(pdf_path):
+# Prompts used for text and scanned PDFs, also part of the description cache key
+TEXT_PROMPT = "Describe this pdf using as much technical detail as possible: "
+IMAGE_PROMPT = "Text could not be extracted from the PDF named: {} so we have converted it to an image, please describe the pdf"
+
+# Prompts for PDFs too long for one request: each chunk is summarized, then the summaries are merged
+CHUNK_PROMPT = "Summarize part {} of {} of the pdf {} with as much technical detail as possible. Part content: "
+PAGE_PROMPT = "This is page {} of {} of the scanned PDF named: {}. Text could not be extracted so we have converted the page to an image, please describe this page"
+PAGES_REDUCE_PROMPT = "These are descriptions of pages of the scanned PDF {} ({} pages in total). Combine them into one description of the whole document: "
+REDUCE_PROMPT = "These are summaries of consecutive parts of the pdf {}{}. Combine them into one description of the whole document using as much technical detail as possible: "
+
+# Only this many pages and characters of a PDF are read
+MAX_PDF_PAGES = int(os.getenv('PDF_MAX_PAGES', '200'))
+MAX_PDF_CHARS = int(os.getenv('PDF_MAX_CHARS', '400000'))
+
+# Context window requested for Llama3, in tokens. Without it Ollama uses its own much
+# smaller default and silently drops the start of longer prompts
+SUMMARY_NUM_CTX = int(os.getenv('PDF_NUM_CTX', '8192'))
+
+# Tokens of the context kept free for the prompt text and the answer
+SUMMARY_RESERVED_TOKENS = 2048
+
+# Characters of PDF text per request, sized to fit the context. Text runs at roughly
+# 4 characters per token; 3 is assumed so dense technical text still fits
+CHUNK_CHARS = int(os.getenv('PDF_CHUNK_CHARS', str((SUMMARY_NUM_CTX - SUMMARY_RESERVED_TOKENS) * 3)))
+
+# Chunk summaries requested from Ollama at the same time
+SUMMARY_WORKERS = int(os.getenv('PDF_SUMMARY_WORKERS', '2'))
+
+# Resolution scanned pages are rendered at for llava, lowered further for
+# large sheets so the longest side stays within MAX_IMAGE_SIDE pixels
+PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', '150'))
+
+# Pages of a scanned PDF that are rendered and described. 1 keeps to the first page
+SCANNED_PDF_PAGES = int(os.getenv('PDF_SCANNED_PAGES', '1'))
+
+# Processes rendering scanned pages; rasterizing is CPU bound, unlike the Ollama calls
+RENDER_PROCESSES = int(os.getenv('PDF_RENDER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def iter_page_text(doc, max_pages=MAX_PDF_PAGES, max_chars=MAX_PDF_CHARS):
+    """
+    Yield the text of each page in order, one page at a time, stopping once the
+    page or character budget is used up. The last page is cut to fit.
+    """
+    remaining = max_chars
+    for page_number in range(min(doc.page_count, max_pages)):
+        if remaining <= 0:
+            break
+        text = doc.load_page(page_number).get_text()
+        if len(text) > remaining:
+            text = text[:remaining]
+        remaining -= len(text)
+        yield text
+
+def chunk_text(pages, chunk_chars=CHUNK_CHARS):
+    """Group page texts into chunks of at most chunk_chars, splitting pages that are longer"""
+    parts = []
+    size = 0
+    for text in pages:
+        while text:
+            piece = text[:chunk_chars - size]
+            text = text[len(piece):]
+            parts.append(piece)
+            size += len(piece)
+            if size >= chunk_chars:
+                yield "".join(parts)
+                parts = []
+                size = 0
+    if size:
+        yield "".join(parts)
+
+def summarize(content, seed):
+    """Send one prompt to Llama3 and return the answer"""
+    response = ollama.chat(
+        model='Llama3',
+        messages=[{'role': 'user', 'content': content}],
+        options={'seed': seed, 'num_ctx': SUMMARY_NUM_CTX})
+    return response['message']['content']
+
+def summarize_chunks(pdf_path, chunks, seed):
+    """
+    Map step: summarize each chunk, SUMMARY_WORKERS at a time. Results come back
+    in chunk order so the reduce prompt, and with the fixed seed the final
+    description, is the same on every run.
+    """
+    prompts = [CHUNK_PROMPT.format(index, len(chunks), pdf_path) + chunk
+               for index, chunk in enumerate(chunks, start=1)]
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_WORKERS)) as executor:
+        return list(executor.map(lambda prompt: summarize(prompt, seed), prompts))
+
+def describe_long_text(pdf_path, chunks, seed, note=""):
+    """
+    Map-reduce description of a PDF whose text does not fit in one request.
+    If the chunk summaries are themselves too long for one request, they are
+    summarized again until they fit.
+    """
+    summaries = summarize_chunks(pdf_path, chunks, seed)
+    while True:
+        joined = "\n\n".join(f"Part {index}: {summary}" for index, summary in enumerate(summaries, start=1))
+        if len(joined) <= CHUNK_CHARS:
+            break
+        groups = list(chunk_text(summary + "\n\n" for summary in summaries))
+        # Stop if another round would not make the list any shorter
+        if len(groups) >= len(summaries):
+            break
+        summaries = summarize_chunks(pdf_path, groups, seed)
+    return summarize(REDUCE_PROMPT.format(pdf_path, note) + joined, seed)
+
+def render_page(pdf_path, page_number=0, dpi=PDF_RENDER_DPI, max_side=MAX_IMAGE_SIDE):
+    """
+    Render one page to JPEG bytes in memory. Nothing is written to disk, so any
+    number of PDFs can be rendered at the same time.
+    """
+    with fitz.open(pdf_path) as doc:
+        page = doc.load_page(page_number)
+        # PDF units are 1/72 inch
+        longest = max(page.rect.width, page.rect.height)
+        dpi = min(dpi, 72 * max_side / longest) if longest else dpi
+        pix = page.get_pixmap(dpi=max(1, int(dpi)), alpha=False)
+    # Encoded with Pillow; Pixmap.tobytes in the pinned PyMuPDF 1.21 only writes PNG
+    image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+def pick_pages(page_count, max_pages=SCANNED_PDF_PAGES):
+    """
+    Choose up to max_pages representative pages: the first page, which holds the
+    cover or title sheet, and the rest spaced evenly through the document so the
+    last sheet is included. Scanned pages have no text to find title blocks by,
+    but each sheet of a drawing set carries its own, so spreading the picks
+    covers them.
+    """
+    if max_pages <= 1 or page_count <= 1:
+        return [0] if page_count else []
+    if page_count <= max_pages:
+        return list(range(page_count))
+    step = (page_count - 1) / (max_pages - 1)
+    return sorted({round(index * step) for index in range(max_pages)})
+
+def get_render_pool():
+    """
+    Return the process pool shared by all scanned PDFs, starting it on first use.
+    It is started from a scan worker while other threads hold locks, so workers
+    are spawned fresh rather than forked; render_page is imported by name.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=max(1, RENDER_PROCESSES),
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _render_pool
+
+def render_pages(pdf_path, page_numbers):
+    """Render several pages in parallel in the process pool, in page order"""
+    global _render_pool
+    if len(page_numbers) == 1 or RENDER_PROCESSES <= 1:
+        return [render_page(pdf_path, page_number) for page_number in page_numbers]
+    try:
+        pool = get_render_pool()
+        return list(pool.map(render_page, [pdf_path] * len(page_numbers), page_numbers))
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool; start a fresh one next time and render here
+        with _render_pool_lock:
+            _render_pool = None
+        return [render_page(pdf_path, page_number) for page_number in page_numbers]
+
+def describe_page(pdf_path, page_number, page_count, image, seed):
+    """Describe one rendered page with llava"""
+    response = ollama.chat(
+        model='llava',
+        messages=[{
+            'role': 'user',
+            'content': PAGE_PROMPT.format(page_number + 1, page_count, pdf_path),
+            'images': [image]
+        }],
+        options={'seed': seed})
+    return response['message']['content']
+
+def describe_scanned_pdf(pdf_path, page_count, seed):
+    """
+    Describe an image-only PDF from several of its pages. The chosen pages are
+    rasterized in the process pool, described concurrently, and the page
+    descriptions are merged by Llama3. Returns the description and a list of
+    (page_number, description) pairs, numbered from 1.
+    """
+    page_numbers = pick_pages(page_count, SCANNED_PDF_PAGES)
+    images = render_pages(pdf_path, page_numbers)
+    
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_WORKERS)) as executor:
+        descriptions = list(executor.map(
+            lambda args: describe_page(pdf_path, args[0], page_count, args[1], seed),
+            zip(page_numbers, images)
+        ))
+    pages = [(page_number + 1, description) for page_number, description in zip(page_numbers, descriptions)]
+    
+    joined = "\n\n".join(f"Page {page_number}: {description}" for page_number, description in pages)
+    return summarize(PAGES_REDUCE_PROMPT.format(pdf_path, page_count) + joined, seed), pages
+
+def describe_pdf(pdf_path, page_descriptions=None):
+    """
+    Describe a PDF from its text, or from rendered pages if it has none.
+    Pass a list as `page_descriptions` to receive (page_number, description)
+    pairs for the pages of a scanned PDF that were described one by one.
+    """
     seed="heirloom"
     seed=int(seed.encode('utf-8').hex(), 16)
     try:
         messages = []
+        cache_key = None
         
         if fitz is None:
             # If PyMuPDF is not available, just analyze the PDF based on filename
@@ -21,32 +238,57 @@ def describe_pdf(pdf_path):
         else:
             # Extract text from PDF using fitz
             try:
+                # Reuse the description of an identical PDF if one was already generated
+                cache = get_cache()
+                cache_key = cache.make_key(
+                    pdf_path, 'Llama3/llava', 'pdf',
+                    TEXT_PROMPT + IMAGE_PROMPT + CHUNK_PROMPT + REDUCE_PROMPT +
+                    PAGE_PROMPT + PAGES_REDUCE_PROMPT +
+                    f"{MAX_PDF_PAGES}/{MAX_PDF_CHARS}/{CHUNK_CHARS}/{SUMMARY_NUM_CTX}ctx/{PDF_RENDER_DPI}dpi/{MAX_IMAGE_SIDE}px/{SCANNED_PDF_PAGES}"
+                )
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    if page_descriptions is not None:
+                        cached_pages = cache.get(cache_key + '/pages', count=False)
+                        if cached_pages:
+                            page_descriptions.extend(tuple(page) for page in json.loads(cached_pages))
+                    return cached
+                
                 with fitz.open(pdf_path) as doc:
-                    pdfContent = ""
-                    for page in doc:
-                        pdfContent += page.get_text()
+                    page_count = doc.page_count
+                    chunks = list(chunk_text(iter_page_text(doc)))
                 
                 # If no text is extracted from the PDF, use image-based analysis
-                if not pdfContent.strip():
-                    with fitz.open(pdf_path) as doc:
-                        page = doc.load_page(0)
-                        pix = page.get_pixmap()
-                        image_path = f"page.png"
-                        pix.save(image_path)
+                if not any(chunk.strip() for chunk in chunks) and SCANNED_PDF_PAGES > 1 and page_count > 1:
+                    # Describe several pages of the scan and merge them
+                    description, pages = describe_scanned_pdf(pdf_path, page_count, seed)
+                    cache.put(cache_key, description)
+                    cache.put(cache_key + '/pages', json.dumps(pages))
+                    if page_descriptions is not None:
+                        page_descriptions.extend(pages)
+                    return description
+                elif not any(chunk.strip() for chunk in chunks):
                     message = {
                         'role': 'user',
-                        'content': "Text could not be extracted from the PDF named: " + pdf_path + " so we have converted it to an image, please describe the pdf",
-                        'images': [image_path]
+                        'content': IMAGE_PROMPT.format(pdf_path),
+                        'images': [render_page(pdf_path, 0)]
                     }
                     model = 'llava'
+                elif len(chunks) > 1:
+                    # Too long for one request: summarize the parts, then merge them
+                    note = f" (first {MAX_PDF_PAGES} of {page_count} pages)" if page_count > MAX_PDF_PAGES else ""
+                    description = describe_long_text(pdf_path, chunks, seed, note)
+                    cache.put(cache_key, description)
+                    return description
                 else:
                     message = {
                         'role': 'user',
-                        'content': "Describe this pdf using as much technical detail as possible: " + pdf_path + "pdf content: " + pdfContent + "/end of pdf content",
+                        'content': TEXT_PROMPT + pdf_path + "pdf content: " + chunks[0] + "/end of pdf content",
                     }
                     model = 'Llama3'
             except Exception as e:
                 # If PDF processing fails, fallback to filename-based analysis
+                cache_key = None
                 message = {
                     'role': 'user',
                     'content': f"Error processing PDF. Describe based on filename: {pdf_path}"
@@ -55,12 +297,18 @@ def describe_pdf(pdf_path):
 
         # Get response from Ollama
         messages.append(message)
+        options = {'seed': seed}
+        if model == 'Llama3':
+            options['num_ctx'] = SUMMARY_NUM_CTX
         response = ollama.chat(
             model=model, 
             messages=messages,
-            options={'seed': seed})
+            options=options)
         
-        return response['message']['content']
+        description = response['message']['content']
+        if cache_key is not None:
+            cache.put(cache_key, description)
+        return description
 
     except Exception as e:
         return f"Error: {e}"
\ No newline at end of file
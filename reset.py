@@ -44,8 +44,11 @@ def reset_all():
             # Wait a moment to ensure connection is closed
             time.sleep(0.1)
             
-            # Remove the file
+            # Remove the file, along with any WAL journal files
             os.remove(db_file)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db_file + suffix):
+                    os.remove(db_file + suffix)
             print(f"✓ Removed database: {db_file}")
             db_reset = True
             
@@ -64,6 +67,16 @@ def reset_all():
     else:
         print("ℹ No database file found")
     
+    # 3. Remove the embedding index, which refers to rows of the old database
+    for suffix in ('.f16', '.ids', '.json'):
+        embeddings_file = os.path.join(script_dir, 'scanner_results_embeddings' + suffix)
+        if os.path.exists(embeddings_file):
+            try:
+                os.remove(embeddings_file)
+                print(f"✓ Removed embeddings: {embeddings_file}")
+            except Exception as e:
+                print(f"✗ Error removing embeddings {embeddings_file}: {e}")
+    
     if not (cache_cleared or db_reset):
         print("\nNothing needed to be reset!")
     else:
@@ -0,0 +1,36 @@
+#Startup regression tests for the command line: `python -m pytest test_netscanner_cli.py`.
+#Each check runs in a fresh interpreter under `python -X importtime`, so modules already
+#imported by pytest itself do not hide an import the CLI added
+from database import Database
+from netscanner_cli import HEAVY_MODULES, import_times
+
+def heavy_imports(code):
+    """Top-level packages from HEAVY_MODULES imported while running `code`"""
+    modules, _ = import_times(code)
+    assert modules, "python -X importtime reported no imports"
+    return sorted({name.split('.')[0] for name in modules} & set(HEAVY_MODULES))
+
+def run_cli(argv):
+    """Code that runs the CLI with `argv` the way `python netscanner_cli.py` would"""
+    return (
+        "import netscanner_cli\n"
+        "try:\n"
+        f"    netscanner_cli.main({argv!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+
+def test_import_loads_no_heavy_modules():
+    assert heavy_imports("import netscanner_cli; netscanner_cli.build_parser()") == []
+
+def test_help_loads_no_heavy_modules():
+    assert heavy_imports(run_cli(['--help'])) == []
+
+def test_stats_loads_no_heavy_modules(tmp_path):
+    db_file = str(tmp_path / 'scanner_results.db')
+    Database(db_file).close()
+    assert heavy_imports(run_cli(['--db', db_file, 'stats'])) == []
+
+def test_heavy_imports_are_detected():
+    # Guards the checks above against passing because nothing was parsed
+    assert heavy_imports("import netscanner_cli, numpy") == ['numpy']